@@ -3,10 +3,38 @@ import socket
 
 MAX_MESSAGE_SIZE = 65536
 
+# 4 bytes 長度標頭（網路位元序），預先編譯避免每次解析格式字串
+_HDR = struct.Struct('!I')
+
 class ProtocolError(Exception):
     """協定錯誤"""
     pass
 
+def _send_parts(sock, header, message):
+    """
+    以 sendmsg（writev）一次送出標頭與訊息，處理部分寫入
+
+    不支援 sendmsg 的平台退回串接後 sendall。
+    與 lobby_server/protocol.py 的 _send_parts 刻意保持同一份邏輯：db_server 與
+    lobby_server 各自獨立部署、互不 import，修改其中一份時請同步另一份。
+    """
+    if not hasattr(sock, 'sendmsg'):
+        sock.sendall(header + message)
+        return
+
+    parts = [memoryview(header), memoryview(message)]
+    while parts:
+        sent = sock.sendmsg(parts)
+        if sent == 0:
+            raise ProtocolError("Socket 連線已關閉")
+        # 丟掉已送完的 buffer，剩下的從未送出的位置接著送
+        while parts and sent >= len(parts[0]):
+            sent -= len(parts[0])
+            parts.pop(0)
+        if parts and sent:
+            parts[0] = parts[0][sent:]
+
+
 def send_message(sock, message):
     """
     發送訊息（完整處理部分 I/O）
@@ -29,20 +57,13 @@ def send_message(sock, message):
             raise ProtocolError(f"訊息過長: {msg_len} bytes (最大 {MAX_MESSAGE_SIZE})")
         
         # 3. 建立長度標頭（4 bytes, 網路位元序）
-        header = struct.pack('!I', msg_len)
-        
-        # 4. 完整發送標頭 + 訊息（處理部分 I/O）
-        full_message = header + message
-        total_sent = 0
+        header = _HDR.pack(msg_len)
         
-        while total_sent < len(full_message):
-            try:
-                sent = sock.send(full_message[total_sent:])
-                if sent == 0:
-                    raise ProtocolError("Socket 連線已關閉")
-                total_sent += sent
-            except socket.error as e:
-                raise ProtocolError(f"發送失敗: {e}")
+        # 4. 完整發送標頭 + 訊息（sendmsg 一次 writev，不另外串接 buffer）
+        try:
+            _send_parts(sock, header, message)
+        except socket.error as e:
+            raise ProtocolError(f"發送失敗: {e}")
                 
     except Exception as e:
         raise ProtocolError(f"發送訊息時發生錯誤: {e}")
@@ -94,7 +115,7 @@ def recv_message(sock):
         header = recv_exact(sock, 4)
         
         # 2. 解析長度
-        msg_len = struct.unpack('!I', header)[0]
+        msg_len = _HDR.unpack(header)[0]
         
         # 3. 驗證長度
         if msg_len <= 0:
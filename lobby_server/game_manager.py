@@ -183,7 +183,8 @@ class GameManager:
     def shutdown_all(self):
         """關閉所有 Game Server"""
         logger.info("🛑 關閉所有 Game Server...")
+        # 只在取 room_ids 時持有 lock；stop_game_server 會自行取得 lock
         with self.lock:
             room_ids = list(self.active_games.keys())
-            for room_id in room_ids:
-                self.stop_game_server(room_id)
\ No newline at end of file
+        for room_id in room_ids:
+            self.stop_game_server(room_id)
\ No newline at end of file
@@ -6,12 +6,27 @@ import logging
 import hashlib
 import signal
 import sys
+import os
 import argparse
 from datetime import datetime
-from protocol import send_message, recv_message, ProtocolError
+from protocol import send_message, ProtocolError, MessageReader, set_socket_buffers
 from db_client import DBClient
 from game_manager import GameManager
 from queue import Queue  # 新增：發送任務隊列
+from concurrent.futures import ThreadPoolExecutor
+
+# 請求 / 回應 / 通知的 JSON 編解碼：有 orjson 就用（較快，直接產生 UTF-8 bytes），
+# 否則退回標準庫 json。room / 遊戲結果可能以 int 為 key，需開 OPT_NON_STR_KEYS
+try:
+    import orjson
+
+    def _dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+    _loads = orjson.loads
+except ImportError:
+    _dumps = json.dumps
+    _loads = json.loads
 
 # 設定 logging
 logging.basicConfig(
@@ -30,13 +45,18 @@ class LobbyServer:
         self.running = False
 
         # Game Server host (can be set via environment variable)
-        import os
         self.game_server_host = os.environ.get('GAME_SERVER_HOST', '140.113.17.11')
         self.shutdown_flag = False
         
-        # DB 客戶端
+        # DB 客戶端：只在啟動時做連線檢查（並提供 host / port），實際請求都走下面的 executor
         self.db = DBClient(db_host, db_port)
 
+        # DB 請求 executor（每個 worker 持有自己的 DBClient 連線，多個登入可並行）
+        self._db_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="db-worker")
+        self._db_local = threading.local()
+        self._db_clients = []
+        self._db_clients_lock = threading.Lock()
+
         # Game Server 管理器
         self.game_manager = GameManager()
         
@@ -45,6 +65,10 @@ class LobbyServer:
         self.user_sockets = {}  # {socket: user_id}
         self.lock = threading.Lock()
 
+        # 線上使用者列表快照（login/logout 時失效，list_online_users 直接回傳）
+        self._online_snapshot = None
+        self._online_dirty = True
+
         # 心跳監控
         self._heartbeat_monitor_thread = None
         self._heartbeat_monitor_running = False
@@ -89,7 +113,7 @@ class LobbyServer:
 
                     # 實際發送（仍使用既有的 protocol.send_message）
                     logger.info(f"[WORKER] 📤 About to send to user {user_id}")
-                    send_message(sock, json.dumps(message))
+                    send_message(sock, _dumps(message))
                     logger.info(f"[worker] 已發送給 user {user_id}: type={message.get('type', 'unknown')}")
                 except Exception as e:
                     logger.error(f"[worker] 傳送給 {user_id} 發生錯誤: {e}")
@@ -99,6 +123,7 @@ class LobbyServer:
                             if user_id in self.online_users and self.online_users[user_id]["socket"] is sock:
                                 del self.user_sockets[sock]
                                 del self.online_users[user_id]
+                                self._online_dirty = True
                                 logger.info(f"🧹 已移除連線失敗的使用者 {user_id}")
                     except Exception:
                         pass
@@ -109,6 +134,21 @@ class LobbyServer:
                 import time
                 time.sleep(0.1)
 
+    def _worker_db(self):
+        """取得目前 DB worker 專屬的 DBClient（第一次使用時建立）"""
+        db = getattr(self._db_local, "db", None)
+        if db is None:
+            db = DBClient(self.db.db_host, self.db.db_port)
+            self._db_local.db = db
+            with self._db_clients_lock:
+                self._db_clients.append(db)
+        return db
+
+    def _db_call(self, method, *args):
+        """把 DB I/O 交給 executor 執行並等待結果"""
+        future = self._db_executor.submit(lambda: method(self._worker_db(), *args))
+        return future.result()
+
     def _start_heartbeat_monitor(self):
         """啟動心跳監控執行緒"""
         self._heartbeat_monitor_running = True
@@ -186,14 +226,18 @@ class LobbyServer:
     def start(self):
         """啟動 Lobby Server"""
         try:
-            # 連線到 DB
+            # 啟動前確認 DB Server 可連線；檢查完就關閉，之後的 DB 請求由各 worker 自己的連線處理
             if not self.db.connect():
                 logger.error("❌ 無法連線到 DB Server，請確認 DB Server 已啟動")
                 return
+            self.db.disconnect()
             
             # 建立 socket
             self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            # accept 出來的 client socket 會繼承 listening socket 的 buffer 大小
+            sndbuf, rcvbuf = set_socket_buffers(self.server_socket)
+            logger.info(f"📐 Socket buffer: SO_SNDBUF={sndbuf}, SO_RCVBUF={rcvbuf}")
             self.server_socket.bind((self.host, self.port))
             self.server_socket.listen(10)
             self.running = True
@@ -207,6 +251,7 @@ class LobbyServer:
             while self.running:
                 try:
                     client_sock, client_addr = self.server_socket.accept()
+                    client_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
                     logger.info(f"📥 新連線來自 {client_addr}")
                     
                     # 建立執行緒處理
@@ -230,6 +275,7 @@ class LobbyServer:
     def handle_client(self, client_sock, client_addr):
         """處理客戶端連線"""
         user_id = None
+        reader = MessageReader(client_sock)  # 此連線專用的串流讀取器
         
         try:
             client_sock.settimeout(600)  # 10 分鐘超時
@@ -237,8 +283,8 @@ class LobbyServer:
             while self.running:
                 try:
                     # 接收請求
-                    request_str = recv_message(client_sock)
-                    request = json.loads(request_str)
+                    request_str = reader.read_message()
+                    request = _loads(request_str)
                     
                     action = request.get("action")
                     data = request.get("data", {})
@@ -290,10 +336,14 @@ class LobbyServer:
                     else:
                         response = {"status": "error", "message": f"未知的 action: {action}"}
 
+                    # 請求帶有 id 時原樣帶回，讓 client 能對應回應與請求
+                    if "id" in request:
+                        response = {**response, "id": request["id"]}
+
                     # 回傳結果
                     logger.info(f"📤 [Thread-{thread_id}] 準備發送回應給 {client_addr}: {response}")
                     try:
-                        send_message(client_sock, json.dumps(response))
+                        send_message(client_sock, _dumps(response))
                         logger.info(f"✅ 回應已發送給 {client_addr}")
                     except ProtocolError as e:
                         logger.error(f"❌ 發送回應失敗給 {client_addr}: {e}")
@@ -311,7 +361,7 @@ class LobbyServer:
                     logger.warning(f"⚠️ JSON 解析錯誤: {e}")
                     error_response = {"status": "error", "message": "JSON 格式錯誤"}
                     logger.info("format!!!!!!!!!!!!!!!!")
-                    send_message(client_sock, json.dumps(error_response))
+                    send_message(client_sock, _dumps(error_response))
                 except socket.timeout:
                     logger.warning(f"⏰ 客戶端 {client_addr} 超時")
                     logger.info("timeout!!!!!!!!!!!!!!!!")
@@ -348,7 +398,7 @@ class LobbyServer:
             return {"status": "error", "message": "缺少必要欄位"}
         
         # 檢查 email 是否已存在
-        existing_user = self.db.get_user_by_email(email)
+        existing_user = self._db_call(DBClient.get_user_by_email, email)
         if existing_user:
             return {"status": "error", "message": "Email 已被註冊"}
         
@@ -356,7 +406,7 @@ class LobbyServer:
         password_hash = hashlib.sha256(password.encode()).hexdigest()
         
         # 建立使用者
-        user = self.db.create_user(name, email, password_hash)
+        user = self._db_call(DBClient.create_user, name, email, password_hash)
         if user:
             return {"status": "success", "message": "註冊成功", "data": {"user_id": user["id"]}}
         else:
@@ -371,7 +421,7 @@ class LobbyServer:
             return {"status": "error", "message": "缺少必要欄位"}
 
         # 查詢使用者
-        user = self.db.get_user_by_email(email)
+        user = self._db_call(DBClient.get_user_by_email, email)
         if not user:
             return {"status": "error", "message": "使用者不存在"}
 
@@ -387,7 +437,7 @@ class LobbyServer:
 
         # 更新最後登入時間
         now = datetime.now().isoformat()
-        self.db.update_user_login(user["id"], now)
+        self._db_call(DBClient.update_user_login, user["id"], now)
 
         # 加入線上使用者列表
         import time
@@ -400,6 +450,7 @@ class LobbyServer:
                 "last_heartbeat": time.time()  # 記錄初始心跳時間
             }
             self.user_sockets[client_sock] = user["id"]
+            self._online_dirty = True
         
         logger.info(f"👤 使用者 {user['name']} (ID: {user['id']}) 已登入")
         
@@ -439,6 +490,7 @@ class LobbyServer:
             if user_info:
                 logger.info(f"👋 使用者 {user_info['name']} (ID: {user_id}) 已登出")
                 del self.online_users[user_id]
+                self._online_dirty = True
             del self.user_sockets[client_sock]
 
             # Find affected rooms and their members
@@ -462,7 +514,7 @@ class LobbyServer:
             # Clean up empty rooms
             for room_id in rooms_to_cleanup:
                 del self.rooms[room_id]
-                self.db.delete_room(room_id)
+                self._db_call(DBClient.delete_room, room_id)
                 logger.info(f"🗑️ 房間 {room_id} 已刪除（無成員）")
 
         # Step 2: Send notifications OUTSIDE the lock
@@ -481,17 +533,20 @@ class LobbyServer:
     # ========== 列表查詢 ==========
     
     def handle_list_online_users(self):
-        """列出線上使用者"""
+        """列出線上使用者（快照未失效時直接回傳，不重建列表）"""
         with self.lock:
-            users = [
-                {"user_id": uid, "name": info["name"]}
-                for uid, info in self.online_users.items()
-            ]
+            if self._online_dirty or self._online_snapshot is None:
+                self._online_snapshot = [
+                    {"user_id": uid, "name": info["name"]}
+                    for uid, info in self.online_users.items()
+                ]
+                self._online_dirty = False
+            users = self._online_snapshot
         return {"status": "success", "data": users}
     
     def handle_list_rooms(self):
         """列出公開房間"""
-        rooms = self.db.get_public_rooms()
+        rooms = self._db_call(DBClient.get_public_rooms)
         
         # 加上即時狀態（成員數量等）
         for room in rooms:
@@ -518,7 +573,7 @@ class LobbyServer:
             return {"status": "error", "message": "房間名稱不可為空"}
         
         # 建立房間（在 DB）
-        room = self.db.create_room(room_name, user_id, visibility)
+        room = self._db_call(DBClient.create_room, room_name, user_id, visibility)
         if not room:
             return {"status": "error", "message": "建立房間失敗"}
         
@@ -544,7 +599,7 @@ class LobbyServer:
         room_id = data.get("room_id")
 
         # 從 DB 取得房間資訊
-        room = self.db.get_room(room_id)
+        room = self._db_call(DBClient.get_room, room_id)
         if not room:
             return {"status": "error", "message": "房間不存在"}
 
@@ -616,7 +671,7 @@ class LobbyServer:
             # 如果房間空了，刪除房間
             if len(self.rooms[room_id]["members"]) == 0:
                 del self.rooms[room_id]
-                self.db.delete_room(room_id)
+                self._db_call(DBClient.delete_room, room_id)
                 logger.info(f"🗑️ 房間 {room_id} 已刪除（無成員）")
         
         logger.info(f"🚪 使用者 {user_id} 離開房間 {room_id}")
@@ -642,7 +697,7 @@ class LobbyServer:
         invitee_id = data.get("user_id")
         
         # 檢查房間
-        room = self.db.get_room(room_id)
+        room = self._db_call(DBClient.get_room, room_id)
         if not room:
             return {"status": "error", "message": "房間不存在"}
         
@@ -744,7 +799,7 @@ class LobbyServer:
                 return {"status": "error", "message": f"房間需要 2 人才能開始（目前 {len(members)} 人）"}
             
             # 檢查是否為房主
-            room = self.db.get_room(room_id)
+            room = self._db_call(DBClient.get_room, room_id)
             if room["host_user_id"] != user_id:
                 return {"status": "error", "message": "只有房主可以開始遊戲"}
         
@@ -756,7 +811,7 @@ class LobbyServer:
             return {"status": "error", "message": "無法啟動 Game Server"}
         
         # 更新房間狀態
-        self.db.update_room(room_id, {"status": "playing"})
+        self._db_call(DBClient.update_room, room_id, {"status": "playing"})
         
         # 通知所有玩家連線到 Game Server
         game_port = game_info["port"]
@@ -818,7 +873,7 @@ class LobbyServer:
                 })
 
             # 儲存到資料庫
-            self.db.create_gamelog(match_id, room_id, user_ids, db_results)
+            self._db_call(DBClient.create_gamelog, match_id, room_id, user_ids, db_results)
             logger.info(f"📊 已儲存遊戲記錄: {match_id}")
         except Exception as e:
             logger.error(f"❌ 儲存遊戲記錄失敗: {e}")
@@ -826,7 +881,7 @@ class LobbyServer:
             traceback.print_exc()
 
         # 重置房間狀態為 waiting
-        self.db.update_room(room_id, {"status": "waiting"})
+        self._db_call(DBClient.update_room, room_id, {"status": "waiting"})
         logger.info(f"🏠 房間 {room_id} 狀態重置為 waiting")
 
         # 從 GameManager 清除遊戲
@@ -894,7 +949,7 @@ class LobbyServer:
             self.rooms[room_id]["replay_responses"][user_id] = want_replay
 
             # 取得房間中的玩家列表
-            room = self.db.get_room(room_id)
+            room = self._db_call(DBClient.get_room, room_id)
             if not room:
                 return {"status": "error", "message": "房間資料不存在"}
 
@@ -960,7 +1015,7 @@ class LobbyServer:
             self.rooms[room_id]["replay_responses"][user_id] = want_replay
 
             # 取得房間中的玩家列表
-            room = self.db.get_room(room_id)
+            room = self._db_call(DBClient.get_room, room_id)
             if not room:
                 return {"status": "error", "message": "房間資料不存在"}
 
@@ -1011,7 +1066,7 @@ class LobbyServer:
         room_id = data.get("room_id")
 
         # 檢查房間是否存在
-        room = self.db.get_room(room_id)
+        room = self._db_call(DBClient.get_room, room_id)
         if not room:
             return {"status": "error", "message": "房間不存在"}
 
@@ -1067,7 +1122,7 @@ class LobbyServer:
                 return
 
             sock = user_info["socket"]
-            send_message(sock, json.dumps(message))
+            send_message(sock, _dumps(message))
             logger.info(f"✅ Sent {message.get('type')} to user {user_id}")
         except Exception as e:
             logger.warning(f"⚠️ Failed to send {message.get('type')} to user {user_id}: {e}")
@@ -1085,8 +1140,20 @@ class LobbyServer:
                 except Exception as e:
                     logger.error(f"❌ 無法通知使用者 {user_id}: {e}")
 
-    def shutdown(self):
-        """關閉伺服器（支援多次呼叫）"""
+    def _shutdown_game_servers(self):
+        """關閉所有 Game Server"""
+        try:
+            self.game_manager.shutdown_all()
+        except Exception as e:
+            logger.error(f"關閉 Game Servers 時發生錯誤: {e}")
+
+    def shutdown(self, timeout=5.0):
+        """
+        關閉伺服器（支援多次呼叫）
+
+        timeout: 等待 Game Server 結束的最長秒數，None 表示一直等。
+                 預設有上限，因為第一次呼叫（通常來自信號處理器）才會真的執行關閉
+        """
         if self.shutdown_flag:
             return  # 已經關閉過了
 
@@ -1104,15 +1171,19 @@ class LobbyServer:
         import time
         time.sleep(0.5)
 
-        # 關閉所有 Game Server
-        try:
-            self.game_manager.shutdown_all()
-        except Exception as e:
-            logger.error(f"關閉 Game Servers 時發生錯誤: {e}")
+        # 關閉所有 Game Server（有 timeout 時不讓卡住的子行程拖住整個關閉流程）
+        stopper = threading.Thread(target=self._shutdown_game_servers, name="game-server-stopper", daemon=True)
+        stopper.start()
+        stopper.join(timeout)
+        if stopper.is_alive():
+            logger.warning(f"⚠️ 關閉 Game Servers 超過 {timeout} 秒，略過等待")
 
         # 關閉 DB 連線
         try:
-            self.db.disconnect()
+            self._db_executor.shutdown(wait=False)
+            with self._db_clients_lock:
+                for db in self._db_clients:
+                    db.disconnect()
         except Exception as e:
             logger.error(f"關閉 DB 連線時發生錯誤: {e}")
 
@@ -1145,7 +1216,7 @@ if __name__ == "__main__":
     # 設定信號處理器，確保優雅關閉
     def signal_handler(sig, *_args):
         logger.info(f"\n⚠️ 收到信號 {sig}，正在關閉伺服器...")
-        server.shutdown()
+        server.shutdown(timeout=5.0)
         sys.exit(0)
 
     signal.signal(signal.SIGINT, signal_handler)   # Ctrl+C
@@ -1168,8 +1239,10 @@ if __name__ == "__main__":
         sys.exit(1)
     except Exception as e:
         logger.error(f"❌ 發生未預期的錯誤: {e}")
-        import traceback
-        traceback.print_exc()
+        # 完整 traceback 只在除錯模式輸出，避免拖慢關閉流程
+        if os.environ.get('LOBBY_DEBUG'):
+            import traceback
+            traceback.print_exc()
         sys.exit(1)
     finally:
-        server.shutdown()
+        server.shutdown(timeout=5.0)
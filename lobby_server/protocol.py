@@ -1,12 +1,73 @@
 import struct
 import socket
+import logging
+import asyncio
+import threading
+
+logger = logging.getLogger(__name__)
 
 MAX_MESSAGE_SIZE = 65536
 
+# 4 bytes 長度標頭（網路位元序），預先編譯避免每次解析格式字串
+_HDR = struct.Struct('!I')
+
+# 合法的訊息本體一定是 JSON object / array，開頭必為 '{' 或 '['
+_JSON_START = (0x7b, 0x5b)
+
+# socket 收送 buffer 大小（實際值仍受 net.core.wmem_max / rmem_max 限制）
+SOCKET_BUFFER_SIZE = 256 * 1024
+
+# 請 kernel 等到收滿 n bytes 才返回（不支援的平台為 0，退回一般 recv）
+_RECV_FLAGS = getattr(socket, 'MSG_WAITALL', 0)
+
 class ProtocolError(Exception):
     """協定錯誤"""
     pass
 
+def _send_parts(sock, header, message):
+    """
+    以 sendmsg（writev）一次送出標頭與訊息，處理部分寫入
+
+    不支援 sendmsg 的平台改用 sendall：標頭以 pack_into 直接寫入預先配置的
+    buffer，訊息本體只複製一次。
+    db_server/protocol.py 有一份刻意保留的同邏輯副本（兩個 server 各自獨立部署），
+    修改時請同步。
+    """
+    if not hasattr(sock, 'sendmsg'):
+        buf = bytearray(len(header) + len(message))
+        _HDR.pack_into(buf, 0, len(message))
+        buf[len(header):] = message
+        sock.sendall(buf)
+        return
+
+    parts = [memoryview(header), memoryview(message)]
+    while parts:
+        sent = sock.sendmsg(parts)
+        if sent == 0:
+            raise ProtocolError("Socket 連線已關閉")
+        # 丟掉已送完的 buffer，剩下的從未送出的位置接著送
+        while parts and sent >= len(parts[0]):
+            sent -= len(parts[0])
+            parts.pop(0)
+        if parts and sent:
+            parts[0] = parts[0][sent:]
+
+
+def set_socket_buffers(sock, size=SOCKET_BUFFER_SIZE):
+    """
+    調大 socket 的 SO_SNDBUF / SO_RCVBUF
+
+    需在 connect / listen 之前呼叫，TCP window scaling 才會依新的大小協商。
+
+    Returns:
+        tuple: kernel 實際採用的 (sndbuf, rcvbuf)
+    """
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, size)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, size)
+    return (sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF),
+            sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF))
+
+
 def send_message(sock, message):
     """
     發送訊息（完整處理部分 I/O）
@@ -18,9 +79,6 @@ def send_message(sock, message):
     Raises:
         ProtocolError: 當發送失敗時
     """
-    import logging
-    logger = logging.getLogger(__name__)
-
     try:
         # 1. 將訊息轉成 bytes
         if isinstance(message, str):
@@ -31,66 +89,71 @@ def send_message(sock, message):
         if msg_len > MAX_MESSAGE_SIZE:
             raise ProtocolError(f"訊息過長: {msg_len} bytes (最大 {MAX_MESSAGE_SIZE})")
 
-        logger.info(f"[PROTOCOL] 準備發送 {msg_len} bytes")
-
         # 3. 建立長度標頭（4 bytes, 網路位元序）
-        header = struct.pack('!I', msg_len)
-
-        # 4. 完整發送標頭 + 訊息（處理部分 I/O）
-        full_message = header + message
-        total_sent = 0
+        header = _HDR.pack(msg_len)
 
-        while total_sent < len(full_message):
-            try:
-                sent = sock.send(full_message[total_sent:])
-                if sent == 0:
-                    raise ProtocolError("Socket 連線已關閉")
-                total_sent += sent
-                logger.info(f"[PROTOCOL] 已發送 {total_sent}/{len(full_message)} bytes")
-            except socket.error as e:
-                raise ProtocolError(f"發送失敗: {e}")
+        # 4. 完整發送標頭 + 訊息（sendmsg 一次 writev，不另外串接 buffer）
+        try:
+            _send_parts(sock, header, message)
+        except socket.error as e:
+            raise ProtocolError(f"發送失敗: {e}")
 
-        logger.info(f"[PROTOCOL] ✅ 完整發送 {total_sent} bytes")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"[PROTOCOL] ✅ 完整發送 {4 + msg_len} bytes")
 
     except Exception as e:
         logger.error(f"[PROTOCOL] ❌ 發送訊息失敗: {e}")
         raise ProtocolError(f"發送訊息時發生錯誤: {e}")
 
 
-def recv_exact(sock, n):
+def recv_exact(sock, n, buf=None):
     """
     接收確切 n bytes（處理部分 I/O）
     
     Args:
         sock: socket 物件
         n: 要接收的位元組數
+        buf: 可重複使用的 bytearray（不足 n 時會自動放大）
         
     Returns:
-        bytes: 接收到的資料
+        bytearray: 接收到的資料（不另外複製成 bytes）；若有傳入 buf，
+            則回傳 buf 本身（前 n bytes 為資料）
         
     Raises:
         ProtocolError: 當接收失敗時
     """
-    data = b''
-    while len(data) < n:
-        try:
-            chunk = sock.recv(n - len(data))
-            if not chunk:
-                raise ProtocolError("連線已關閉（recv 回傳空資料）")
-            data += chunk
-        except socket.timeout:
-            raise ProtocolError("接收逾時")
-        except socket.error as e:
-            raise ProtocolError(f"接收失敗: {e}")
-    return data
+    # 預先配置 buffer，以 recv_into 直接寫入，避免 data += chunk 反覆複製
+    if buf is None:
+        buf = bytearray(n)
+    elif len(buf) < n:
+        # 以倍數成長，上限 MAX_MESSAGE_SIZE
+        buf.extend(bytes(max(n, min(len(buf) * 2, MAX_MESSAGE_SIZE)) - len(buf)))
+    view = memoryview(buf)
+    offset = 0
+    try:
+        while offset < n:
+            try:
+                # 通常一次就收滿；被 signal 打斷等情況回傳不足時由迴圈補收
+                got = sock.recv_into(view[offset:n], n - offset, _RECV_FLAGS)
+                if not got:
+                    raise ProtocolError("連線已關閉（recv 回傳空資料）")
+                offset += got
+            except socket.timeout:
+                raise ProtocolError("接收逾時")
+            except socket.error as e:
+                raise ProtocolError(f"接收失敗: {e}")
+    finally:
+        view.release()
+    return buf
 
 
-def recv_message(sock):
+def recv_message(sock, buf=None):
     """
     接收一個完整訊息
     
     Args:
         sock: socket 物件
+        buf: 每條連線各自持有、可重複使用的接收 bytearray（可省略）
         
     Returns:
         str: 解碼後的訊息
@@ -100,10 +163,10 @@ def recv_message(sock):
     """
     try:
         # 1. 先接收 4 bytes 的長度標頭
-        header = recv_exact(sock, 4)
+        header = recv_exact(sock, 4, buf)
         
         # 2. 解析長度
-        msg_len = struct.unpack('!I', header)[0]
+        msg_len = _HDR.unpack_from(header)[0]
         
         # 3. 驗證長度
         if msg_len <= 0:
@@ -112,10 +175,283 @@ def recv_message(sock):
             raise ProtocolError(f"訊息過長: {msg_len} bytes (最大 {MAX_MESSAGE_SIZE})")
         
         # 4. 接收訊息本體
-        message = recv_exact(sock, msg_len)
+        message = recv_exact(sock, msg_len, buf)
+        if message[0] not in _JSON_START:
+            raise ProtocolError("訊息不是 JSON object/array")
         
-        # 5. 解碼為字串
-        return message.decode('utf-8')
+        # 5. 解碼為字串（直接從 buffer 解碼，不另外切出 bytes）
+        with memoryview(message) as view:
+            return str(view[:msg_len], 'utf-8')
         
     except UnicodeDecodeError as e:
-        raise ProtocolError(f"UTF-8 解碼失敗: {e}")
\ No newline at end of file
+        raise ProtocolError(f"UTF-8 解碼失敗: {e}")
+
+
+class MessageReader:
+    """
+    串流式訊息讀取器
+
+    一次 recv 盡量多的資料放進持續存在的 buffer，再從中切出完整訊息；
+    多出來的 bytes 保留給下一則訊息，連續到達的訊息不必各自兩次 recv。
+    每條連線各自建立一個 MessageReader，且只由單一執行緒讀取。
+    """
+
+    RECV_SIZE = 4 + MAX_MESSAGE_SIZE
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.buf = bytearray()
+        # recv_into 的暫存區：每次 recv 不必另外配置一個 RECV_SIZE 大小的 bytes
+        self._scratch = memoryview(bytearray(self.RECV_SIZE))
+
+    def _fill(self):
+        """從 socket 讀入更多資料"""
+        try:
+            got = self.sock.recv_into(self._scratch)
+        except socket.timeout:
+            raise ProtocolError("接收逾時")
+        except socket.error as e:
+            raise ProtocolError(f"接收失敗: {e}")
+        if not got:
+            raise ProtocolError("連線已關閉（recv 回傳空資料）")
+        self.buf += self._scratch[:got]
+
+    def _next_frame(self, off):
+        """
+        檢查 buf[off:] 開頭是否已是完整訊息
+
+        Returns:
+            tuple: (本體起點, 結尾)；資料還不完整時回傳 None
+
+        Raises:
+            ProtocolError: 長度不合法時（本體格式由呼叫端檢查，才能先把該 frame 移出 buffer）
+        """
+        if len(self.buf) - off < 4:
+            return None
+        msg_len = _HDR.unpack_from(self.buf, off)[0]
+        if msg_len <= 0:
+            raise ProtocolError(f"無效的訊息長度: {msg_len}")
+        if msg_len > MAX_MESSAGE_SIZE:
+            raise ProtocolError(f"訊息過長: {msg_len} bytes (最大 {MAX_MESSAGE_SIZE})")
+        end = off + 4 + msg_len
+        if len(self.buf) < end:
+            return None
+        return off + 4, end
+
+    def read_message(self):
+        """
+        讀取一個完整訊息
+
+        Returns:
+            str: 解碼後的訊息
+
+        Raises:
+            ProtocolError: 當接收失敗或格式錯誤時
+        """
+        # 1. 湊齊標頭與本體（長度一到齊就先驗證）
+        frame = self._next_frame(0)
+        while frame is None:
+            self._fill()
+            frame = self._next_frame(0)
+        start, end = frame
+
+        # 2. 解碼並從 buffer 移除這則訊息（剩餘資料留給下一次；不合法的訊息也一併丟棄）
+        try:
+            if self.buf[start] not in _JSON_START:
+                raise ProtocolError("訊息不是 JSON object/array")
+            with memoryview(self.buf) as view:
+                return str(view[start:end], 'utf-8')
+        except UnicodeDecodeError as e:
+            raise ProtocolError(f"UTF-8 解碼失敗: {e}")
+        finally:
+            del self.buf[:end]
+
+    def read_messages(self, decode=None):
+        """
+        讀取目前 buffer 中所有完整訊息（至少一則）
+
+        buffer 裡已有完整訊息時不會呼叫 recv；否則一次 recv 後把收到的
+        訊息全部切出來，連續推送的通知只需要一次系統呼叫。
+
+        Args:
+            decode: 以 buffer 的 memoryview 切片為參數的解碼函式（例如
+                orjson.loads），讓每則訊息不必先複製成 str / bytes；
+                省略時以 UTF-8 解碼為 str。切片只在呼叫期間有效。
+
+        Returns:
+            list: 依到達順序排列的解碼結果
+
+        Raises:
+            ProtocolError: 當接收失敗或格式錯誤時
+        """
+        while True:
+            messages = []
+            off = 0
+            try:
+                with memoryview(self.buf) as view:
+                    while True:
+                        try:
+                            frame = self._next_frame(off)
+                        except ProtocolError:
+                            # 先交出前面完好的訊息，不合法的 frame 留到下次呼叫再回報
+                            if messages:
+                                break
+                            raise
+                        if frame is None:
+                            break
+                        start, end = frame
+                        if self.buf[start] not in _JSON_START:
+                            if messages:
+                                break
+                            off = end
+                            raise ProtocolError("訊息不是 JSON object/array")
+                        try:
+                            if decode is None:
+                                messages.append(str(view[start:end], 'utf-8'))
+                            else:
+                                with view[start:end] as payload:
+                                    messages.append(decode(payload))
+                        except UnicodeDecodeError as e:
+                            if messages:
+                                break
+                            off = end
+                            raise ProtocolError(f"UTF-8 解碼失敗: {e}")
+                        off = end
+            finally:
+                # 已切出的訊息一次移除，不逐則搬移 buffer
+                if off:
+                    del self.buf[:off]
+            if messages:
+                return messages
+            self._fill()
+
+
+def frame_message(message):
+    """
+    預先組好完整 frame（長度標頭 + 本體），供內容固定的訊息重複送出
+
+    Args:
+        message: 字串或 bytes
+
+    Returns:
+        bytes: 可直接交給 MessageWriter.send_frame 的 frame
+    """
+    if isinstance(message, str):
+        message = message.encode('utf-8')
+    if len(message) > MAX_MESSAGE_SIZE:
+        raise ProtocolError(f"訊息過長: {len(message)} bytes (最大 {MAX_MESSAGE_SIZE})")
+    return _HDR.pack(len(message)) + message
+
+
+class MessageWriter:
+    """
+    串流式訊息寫入器
+
+    每條連線一個：標頭與本體組進同一塊重複使用的 buffer，一次 sendall 送出，
+    每則訊息不另外配置標頭或串接用的 bytes；lock 確保多個執行緒（主迴圈
+    與通知 / 接收緒）送出的 frame 不會交錯。
+    """
+
+    def __init__(self, sock, size=8192):
+        self.sock = sock
+        self.buf = bytearray(size)
+        self.lock = threading.Lock()
+
+    def send_message(self, message):
+        """
+        發送訊息
+
+        Args:
+            message: 字串或 bytes
+
+        Raises:
+            ProtocolError: 當發送失敗時
+        """
+        if isinstance(message, str):
+            message = message.encode('utf-8')
+        msg_len = len(message)
+        if msg_len > MAX_MESSAGE_SIZE:
+            raise ProtocolError(f"訊息過長: {msg_len} bytes (最大 {MAX_MESSAGE_SIZE})")
+
+        end = 4 + msg_len
+        with self.lock:
+            if end > len(self.buf):
+                # 以倍數成長，上限為最大 frame 大小
+                self.buf.extend(bytes(min(max(end, len(self.buf) * 2), 4 + MAX_MESSAGE_SIZE) - len(self.buf)))
+            _HDR.pack_into(self.buf, 0, msg_len)
+            self.buf[4:end] = message
+            try:
+                with memoryview(self.buf) as view:
+                    self.sock.sendall(view[:end])
+            except socket.error as e:
+                raise ProtocolError(f"發送失敗: {e}")
+
+    def send_frame(self, frame):
+        """
+        直接送出 frame_message 預先組好的 frame（不經 buffer 複製）
+
+        Raises:
+            ProtocolError: 當發送失敗時
+        """
+        with self.lock:
+            try:
+                self.sock.sendall(frame)
+            except socket.error as e:
+                raise ProtocolError(f"發送失敗: {e}")
+
+
+async def send_message_async(writer, message):
+    """
+    發送訊息（asyncio 版本）
+
+    Args:
+        writer: asyncio.StreamWriter
+        message: 字串或 bytes
+
+    Raises:
+        ProtocolError: 當發送失敗時
+    """
+    if isinstance(message, str):
+        message = message.encode('utf-8')
+
+    msg_len = len(message)
+    if msg_len > MAX_MESSAGE_SIZE:
+        raise ProtocolError(f"訊息過長: {msg_len} bytes (最大 {MAX_MESSAGE_SIZE})")
+
+    try:
+        writer.writelines((_HDR.pack(msg_len), message))
+        await writer.drain()
+    except (ConnectionError, OSError) as e:
+        raise ProtocolError(f"發送失敗: {e}")
+
+
+async def recv_message_async(reader):
+    """
+    接收一個完整訊息（asyncio 版本）
+
+    Args:
+        reader: asyncio.StreamReader
+
+    Returns:
+        str: 解碼後的訊息
+
+    Raises:
+        ProtocolError: 當接收失敗或格式錯誤時
+    """
+    try:
+        header = await reader.readexactly(4)
+        msg_len = _HDR.unpack(header)[0]
+        if msg_len <= 0:
+            raise ProtocolError(f"無效的訊息長度: {msg_len}")
+        if msg_len > MAX_MESSAGE_SIZE:
+            raise ProtocolError(f"訊息過長: {msg_len} bytes (最大 {MAX_MESSAGE_SIZE})")
+        message = await reader.readexactly(msg_len)
+        if message[0] not in _JSON_START:
+            raise ProtocolError("訊息不是 JSON object/array")
+        return message.decode('utf-8')
+    except asyncio.IncompleteReadError:
+        raise ProtocolError("連線已關閉（recv 回傳空資料）")
+    except (ConnectionError, OSError) as e:
+        raise ProtocolError(f"接收失敗: {e}")
+    except UnicodeDecodeError as e:
+        raise ProtocolError(f"UTF-8 解碼失敗: {e}")
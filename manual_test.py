@@ -3,43 +3,57 @@
 Manual step-by-step test
 """
 
-from test_lobby_client import LobbyClient
+import asyncio
+from test_lobby_client import AsyncLobbyClient
 import sys
 
-print("Creating clients...")
-alice = LobbyClient()
-bob = LobbyClient()
 
-print("Connecting...")
-alice.connect()
-bob.connect()
+async def main():
+    print("Creating clients...")
+    alice = AsyncLobbyClient()
+    bob = AsyncLobbyClient()
 
-print("Registering...")
-alice.register("ManualAlice", "manualalice@test.com", "pass")
-bob.register("ManualBob", "manualbob@test.com", "pass")
+    try:
+        # Alice 與 Bob 在建立房間前互不相依，兩邊的 RTT 可以重疊
+        print("Connecting...")
+        await asyncio.gather(alice.connect(), bob.connect())
 
-print("Logging in...")
-alice.login("manualalice@test.com", "pass")
-bob.login("manualbob@test.com", "pass")
+        print("Registering...")
+        await asyncio.gather(
+            alice.register("ManualAlice", "manualalice@test.com", "pass"),
+            bob.register("ManualBob", "manualbob@test.com", "pass"),
+        )
 
-print(f"Alice ID: {alice.user_id}, Bob ID: {bob.user_id}")
+        print("Logging in...")
+        await asyncio.gather(
+            alice.login("manualalice@test.com", "pass"),
+            bob.login("manualbob@test.com", "pass"),
+        )
 
-print("Creating room...")
-resp = alice.create_room("Manual Test Room", "public")
-room_id = resp["data"]["id"]
-print(f"Room ID: {room_id}")
+        print(f"Alice ID: {alice.user_id}, Bob ID: {bob.user_id}")
 
-print("Bob joining...")
-bob.join_room(room_id)
+        print("Creating room...")
+        resp = await alice.create_room("Manual Test Room", "public")
+        room_id = resp["data"]["id"]
+        print(f"Room ID: {room_id}")
 
-print("Starting game...")
-resp = alice.send_request("start_game", {"room_id": room_id})
-print(f"Start game response: {resp}")
+        print("Bob joining...")
+        await bob.join_room(room_id)
 
-if resp.get("status") == "success":
-    game_host = resp["data"]["game_server_host"]
-    game_port = resp["data"]["game_server_port"]
-    print(f"\nGame server at: {game_host}:{game_port}")
-    print(f"\nTo play:")
-    print(f"python3 game_client.py --host {game_host} --port {game_port} --room-id {room_id} --user-id {alice.user_id}")
-    print(f"python3 game_client.py --host {game_host} --port {game_port} --room-id {room_id} --user-id {bob.user_id}")
+        print("Starting game...")
+        resp = await alice.send_request("start_game", {"room_id": room_id})
+        print(f"Start game response: {resp}")
+
+        if resp.get("status") == "success":
+            game_host = resp["data"]["game_server_host"]
+            game_port = resp["data"]["game_server_port"]
+            print(f"\nGame server at: {game_host}:{game_port}")
+            print(f"\nTo play:")
+            print(f"python3 game_client.py --host {game_host} --port {game_port} --room-id {room_id} --user-id {alice.user_id}")
+            print(f"python3 game_client.py --host {game_host} --port {game_port} --room-id {room_id} --user-id {bob.user_id}")
+    finally:
+        # 明確關閉連線（取消 reader task），不留給直譯器結束時清理
+        await asyncio.gather(alice.close(), bob.close())
+
+
+asyncio.run(main())
@@ -10,13 +10,167 @@ import json
 import sys
 import os
 import threading
+import selectors
+import select
+import time
+import traceback
 import subprocess
+import itertools
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+import re
+
+# 只在匯入 protocol 的這一刻把 lobby_server 放進 sys.path，匯入完就移除，
+# 之後的 import（如 main() 裡的 argparse）不必每次都先掃過這個目錄
+_LOBBY_SERVER_DIR = os.path.join(os.path.dirname(__file__), 'lobby_server')
+sys.path.insert(0, _LOBBY_SERVER_DIR)
+try:
+    from protocol import (ProtocolError, MessageReader, MessageWriter, frame_message,
+                          set_socket_buffers)
+finally:
+    sys.path.remove(_LOBBY_SERVER_DIR)
+
+# 熱路徑上的 JSON 編解碼函式（模組載入時綁定一次）
+# 有安裝 orjson 就用它（較快，且直接產生 UTF-8 bytes），否則退回標準庫 json
+try:
+    import orjson
+    _dumps = orjson.dumps
+    _loads = orjson.loads  # 可直接吃 bytes / memoryview，不必先轉成 str
+except ImportError:
+    # 帶非預設參數的 json.dumps 每次都會新建 JSONEncoder，改為共用同一個
+    _json_encode = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False).encode
+
+    def _dumps(obj):
+        return _json_encode(obj).encode('utf-8')
+
+    def _loads(data):
+        if isinstance(data, memoryview):
+            data = str(data, 'utf-8')
+        return json.loads(data)
+
+# 接收緒每則訊息的 [DEBUG] 輸出只在設了 LOBBY_DEBUG 時印出（格式化整個 dict 並不便宜）
+_DEBUG = bool(os.environ.get('LOBBY_DEBUG'))
+
+
+def _decode_frame(view):
+    """直接從接收 buffer 的切片解析 JSON；無法解析的訊息回傳 None 由呼叫端略過"""
+    try:
+        return _loads(view)
+    except ValueError:
+        # JSONDecodeError 與 UTF-8 解碼錯誤都屬於 ValueError
+        return None
+
+
+# 遊戲 / 觀戰視窗的進入點（與本檔同目錄）
+_GAME_CLIENT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "game_client.py")
+
+# 註冊時明顯不合法的 Email 在 client 端就擋下，不必多跑一趟 RTT
+# （登入不檢查：server 從未驗證過格式，既有帳號的 Email 不一定符合）
+_EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+# 請求外框 {"action": ..., "data": ...} 只有 data 會變：各 action 的前綴預先編好，
+# 無參數的請求更直接快取整個 frame 本體，送出時完全不用 JSON 編碼
+_ACTIONS = (
+    "register", "login", "logout", "create_room", "join_room", "leave_room",
+    "start_game", "list_rooms", "list_online_users", "spectate_game", "heartbeat",
+)
+_NULLARY_ACTIONS = ("list_rooms", "list_online_users", "logout", "heartbeat")
+_ACTION_PREFIX = {name: f'{{"action":"{name}","data":'.encode() for name in _ACTIONS}
+_EMPTY_REQUESTS = {name: f'{{"action":"{name}","data":{{}}}}'.encode() for name in _NULLARY_ACTIONS}
+# 不等回覆、不帶 id 的 logout 連長度標頭都固定，直接預先組成完整 frame
+_LOGOUT_FRAME = frame_message(_EMPTY_REQUESTS["logout"])
+
+# 可在 client 端短暫快取的唯讀查詢；其他請求都可能改變列表內容，送出時清空快取
+_CACHEABLE_ACTIONS = frozenset(("list_rooms", "list_online_users"))
+
+
+def _encode_request(action, data=None, req_id=None):
+    """
+    把請求編成 UTF-8 bytes（緊湊格式），寫入時不必再 encode
+
+    req_id 不為 None 時附上 "id" 欄位，server 會在回應中原樣帶回
+    """
+    if not data and action in _EMPTY_REQUESTS:
+        body = _EMPTY_REQUESTS[action]
+    else:
+        prefix = _ACTION_PREFIX.get(action)
+        if prefix is None:
+            body = _dumps({"action": action, "data": data or {}})
+        else:
+            body = prefix + _dumps(data or {}) + b'}'
+    if req_id is None:
+        return body
+    return b'%s,"id":%d}' % (body[:-1], req_id)
+
+# 固定的選單與標題字串（模組載入時組好一次，含結尾換行，以單次 write 印出）
+_BAR = "=" * 60
+_BAR_OPEN = "\n" + _BAR
+_BAR_CLOSE = _BAR + "\n"
+
+
+def _write_out(parts):
+    """把多行輸出串成一次 write + 一次 flush（TTY 上每個 print 都會各自 flush）"""
+    sys.stdout.write("".join(parts))
+    sys.stdout.flush()
+
+
+def _banner(title):
+    return f"\n{_BAR}\n{title}\n{_BAR}\n"
+
+
+# 主選單連同輸入提示一起組好，每次重畫只需一次 write
+_MENU = _banner("LOBBY MENU") + "\n".join([
+    "1. Register new account",
+    "2. Login",
+    "3. Create room",
+    "4. List public rooms",
+    "5. Join room (as player)",
+    "6. Start game (host only)",
+    "7. List online users",
+    "8. Spectate game (watch only)",
+    "9. Exit",
+    _BAR,
+]) + "\n\nEnter your choice (1-9): "
+_HOST_WAIT_MENU = _banner("等待中 - 房主控制") + "\n".join([
+    "6. 開始遊戲",
+    "9. 離開房間",
+    _BAR,
+]) + "\n\n輸入選項: "
+_WELCOME_BANNER = f"{_BAR}\nWELCOME TO TETRIS LOBBY\n{_BAR}\n\n"
+_REGISTER_BANNER = _banner("註冊")
+_LOGIN_BANNER = _banner("登入")
+_CREATE_ROOM_BANNER = _banner("建立房間")
+_JOIN_ROOM_BANNER = _banner("加入房間")
+_START_GAME_BANNER = _banner("啟動遊戲")
+_ONLINE_USERS_BANNER = _banner("線上使用者")
+_ROOM_LIST_BANNER = _banner("公開房間列表")
+_SPECTATE_BANNER = _banner("觀戰遊戲")
+
+
+# TCP keepalive 參數（平台不支援的選項略過）
+_KEEPALIVE_OPTS = [
+    (getattr(socket, name), value)
+    for name, value in (("TCP_KEEPIDLE", 10), ("TCP_KEEPINTVL", 2), ("TCP_KEEPCNT", 3))
+    if hasattr(socket, name)
+]
+
+
+def _open_lobby_socket(host, port):
+    """建立到 lobby 的 TCP 連線並設定 socket 選項"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    # 關閉 Nagle：小型 JSON 請求立即送出，不等 delayed ACK
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    # 以 TCP keepalive 取代應用層心跳：閒置 10 秒後每 2 秒探測一次，
+    # 連續 3 次沒回應即判定對端已消失
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    for opt, value in _KEEPALIVE_OPTS:
+        sock.setsockopt(socket.IPPROTO_TCP, opt, value)
+    set_socket_buffers(sock)
+    sock.connect((host, port))
+    return sock
+
 
-# Add lobby_server to path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lobby_server'))
-from protocol import send_message, recv_message, ProtocolError
 class InteractiveLobbyClient:
-    def __init__(self, host='localhost', port=10002):
+    def __init__(self, host='localhost', port=10002, cache_ttl=0.0):
         self.host = host
         self.port = port
         self.sock = None
@@ -24,14 +178,22 @@ class InteractiveLobbyClient:
         self.user_name = None
         self.current_room_id = None
 
-        # 用於 background recv 與同步 request 回應
-        from queue import Queue, Empty  # 在 class 內匯入以避免外部依賴問題
-        self._Queue = Queue
-        self._Empty = Empty
+        # 列表查詢的 client 端快取：{action: (monotonic 時間, response)}
+        # cache_ttl 為 0 時不快取（預設），每次都向 server 查詢
+        self.cache_ttl = cache_ttl
+        self._cache = {}
 
-        self._response_queue = self._Queue()
+        # 用於 background recv 與同步 request 回應
+        # 以 request id 對應回應：{id: Future}，recv 緒 set_result 交回回應；
+        # 連線中斷時所有未完成的 Future 直接設為例外，等待者不必等到逾時
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._next_id = itertools.count(1)
+        self._reader = None  # recv thread 專用的串流讀取器（connect 時建立）
+        self._writer = None  # 各執行緒共用、重用 buffer 的寫入器（connect 時建立）
         self._recv_thread = None
         self._recv_running = False
+        self._wake_r = self._wake_w = None  # 叫醒 recv 緒的 socketpair（不必關 lobby 連線）
 
         # 用於處理 replay 請求（避免 stdin 競爭）
         self.pending_replay_request = None  # {"room_id": int}
@@ -46,18 +208,31 @@ class InteractiveLobbyClient:
         # 用於標記是否需要重新顯示選單（notification interrupt）
         self._need_redraw_menu = False
 
-        # 心跳機制
-        self._heartbeat_thread = None
-        self._heartbeat_running = False
+        # 叫醒主迴圈的 self-pipe：通知改變上面這些旗標後寫入一個 byte，
+        # 主迴圈阻塞在 select([stdin, pipe]) 上，不必每 0.1 秒輪詢旗標
+        self._ui_wake_r, self._ui_wake_w = os.pipe()
+        os.set_blocking(self._ui_wake_r, False)
+        os.set_blocking(self._ui_wake_w, False)
+
+        # server 推送的通知類型 → 處理方法（只建一次，分派時查表）
+        self._notification_handlers = {
+            "game_start": self._on_game_start,
+            "room_update": self._on_room_update,
+            "invitation": self._on_invitation,
+            "game_ended": self._on_game_ended,
+            "replay_accepted": self._on_replay_accepted,
+            "replay_rejected": self._on_replay_rejected,
+            "server_shutdown": self._on_server_shutdown,
+            "player_disconnected": self._on_player_disconnected,
+        }
 
     def connect(self):
         try:
-            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.sock.connect((self.host, self.port))
+            self.sock = _open_lobby_socket(self.host, self.port)
+            self._reader = MessageReader(self.sock)
+            self._writer = MessageWriter(self.sock)
             # 啟動 background recv thread（收到通知會即時印出）
             self._start_recv_thread()
-            # 暫時關閉心跳執行緒 - 需要修復
-            # self._start_heartbeat_thread()
             print(f"✅ 成功連線到 Lobby Server\n")
             return True
         except Exception as e:
@@ -67,275 +242,362 @@ class InteractiveLobbyClient:
     def _start_recv_thread(self):
         if self._recv_thread and self._recv_thread.is_alive():
             return
+        if self._wake_r is None:
+            self._wake_r, self._wake_w = socket.socketpair()
         self._recv_running = True
         self._recv_thread = threading.Thread(target=self._recv_loop, daemon=True)
         self._recv_thread.start()
 
     def _stop_recv_thread(self):
-        # 停止接收 loop；實際上會在 close 時關 socket 讓 recv_message 拋例外離開
+        # 停止接收 loop：清旗標後寫入 wake socket，讓阻塞在 select 的 recv 緒立即醒來
         self._recv_running = False
-
-    def _start_heartbeat_thread(self):
-        """啟動心跳執行緒，每 2 秒發送一次心跳"""
-        if self._heartbeat_thread and self._heartbeat_thread.is_alive():
-            return
-        self._heartbeat_running = True
-        self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, daemon=True)
-        self._heartbeat_thread.start()
-
-    def _stop_heartbeat_thread(self):
-        """停止心跳執行緒"""
-        self._heartbeat_running = False
-
-    def _heartbeat_loop(self):
-        """背景持續發送心跳"""
-        import time
-        while self._heartbeat_running:
+        if self._wake_w is not None:
             try:
-                # 每 2 秒發送一次心跳
-                time.sleep(2)
-
-                if not self._heartbeat_running:
-                    break
+                self._wake_w.send(b'x')
+            except OSError:
+                pass
 
-                # 發送心跳訊息
-                send_message(self.sock, json.dumps({
-                    "action": "heartbeat",
-                    "data": {}
-                }))
-            except Exception as e:
-                # 如果發送失敗，可能是斷線了
-                if self._heartbeat_running:
-                    # 短暫休息後重試
-                    time.sleep(1)
+    def _close_wake_pair(self):
+        for s in (self._wake_r, self._wake_w):
+            if s is not None:
+                s.close()
+        self._wake_r = self._wake_w = None
 
     def _recv_loop(self):
-        """背景持續接收：通知直接處理、回應放到 response_queue"""
-        while self._recv_running:
-            try:
-                # blocking recv (不設 timeout)，交由 recv_message 處理 frame
-                msg = recv_message(self.sock)
-                if not msg:
-                    # 若收到空則略過
-                    continue
+        """背景持續接收：通知直接處理、回應依 id 交給 send_request"""
+        sel = selectors.DefaultSelector()
+        sel.register(self.sock, selectors.EVENT_READ)
+        sel.register(self._wake_r, selectors.EVENT_READ)
+        try:
+            while self._recv_running:
                 try:
-                    response = json.loads(msg)
+                    # 阻塞等待 socket 可讀或被 wake socket 叫醒，不輪詢
+                    events = sel.select()
+                    if any(key.fileobj is self._wake_r for key, _ in events):
+                        self._wake_r.recv(4096)
+                        continue  # 回到迴圈頂端檢查 _recv_running
+                    # 一次 recv 收到的所有 frame 都先處理完；對端關閉時 recv 回傳空資料 → 例外離開
+                    for response in self._reader.read_messages(_decode_frame):
+                        if response is not None:
+                            self._dispatch_message(response)
+
                 except Exception:
-                    # 非 JSON 或解析錯誤時略過
-                    continue
+                    # Socket closed or network error - stop recv loop
+                    # 不在這裡重試：斷線不是 close() 造成的，就請主迴圈結束並告知使用者
+                    if self._recv_running:
+                        print("\n❌ 與 Lobby Server 的連線已中斷")
+                        self._should_exit = True
+                    self._recv_running = False
+                    break
+        finally:
+            sel.close()
+            self._fail_pending(ProtocolError("與 Lobby Server 的連線已中斷"))
+            self._wake_main_loop()
+
+    def _wake_main_loop(self):
+        """寫入 self-pipe，讓阻塞在 wait_for_input 的主迴圈醒來"""
+        if self._ui_wake_w is None:
+            return  # close() 已關閉 pipe
+        try:
+            os.write(self._ui_wake_w, b'x')
+        except OSError:
+            # pipe 已滿（主迴圈反正會醒來）或已關閉
+            pass
 
-                # DEBUG: Print what we received
-                print(f"[DEBUG] Received: {response}")
-
-                # 區分通知（server push）vs. 同步回應
-                # 通知有 "type" 欄位，同步回應有 "status" 欄位
-                if response.get("type") and not response.get("status"):
-                    # 這是通知（notification）
-                    print(f"[DEBUG] Treating as notification (has type={response.get('type')}, no status)")
-                    try:
-                        self._handle_notification(response)
-                    except Exception:
-                        # 保險起見不要讓通知 handler 崩潰整個 recv loop
-                        pass
-                    continue
+    def wait_for_input(self, watch_stdin=True):
+        """
+        阻塞直到 stdin 有一行輸入或被通知叫醒
 
-                # 同步回應 → 放到 response queue，供 send_request 取
-                print(f"[DEBUG] Putting in response queue")
-                try:
-                    self._response_queue.put(response)
-                except Exception:
-                    # 若放 queue 失敗，忽略
+        Returns:
+            str: 輸入的一行（已 strip）；被通知叫醒時回傳 None，由呼叫端重新檢查旗標
+        """
+        fds = [sys.stdin, self._ui_wake_r] if watch_stdin else [self._ui_wake_r]
+        ready, _, _ = select.select(fds, [], [])
+        if self._ui_wake_r in ready:
+            try:
+                while os.read(self._ui_wake_r, 4096):
                     pass
-
+            except BlockingIOError:
+                pass
+            return None
+        return sys.stdin.readline().strip()
+
+    def _fail_pending(self, exc):
+        """讓所有還在等待回應的請求立即以 exc 失敗"""
+        with self._pending_lock:
+            futures = list(self._pending.values())
+            self._pending.clear()
+        for future in futures:
+            if not future.done():
+                future.set_exception(exc)
+
+    def _dispatch_message(self, response):
+        """處理一則收到的訊息：通知交給 handler，回應交給等待中的 send_request"""
+        if _DEBUG:
+            print(f"[DEBUG] Received: {response}")
+
+        # 區分通知（server push）vs. 同步回應
+        # 通知有 "type" 欄位，同步回應有 "status" 欄位
+        if response.get("type") and not response.get("status"):
+            # 這是通知（notification）
+            if _DEBUG:
+                print(f"[DEBUG] Treating as notification (has type={response.get('type')}, no status)")
+            try:
+                self._handle_notification(response)
             except Exception:
-                # Socket closed or network error - stop recv loop
-                if not self._recv_running:
-                    break
-                # Connection lost - stop trying
-                self._recv_running = False
-                break
+                # 保險起見不要讓通知 handler 崩潰整個 recv loop
+                pass
+            finally:
+                # 通知可能改變了主迴圈在看的旗標，叫醒它重新檢查
+                self._wake_main_loop()
+            return
+
+        # 同步回應 → 依 id 交給等待中的 send_request
+        # 沒有 id 或已逾時放棄的 id 直接丟棄
+        with self._pending_lock:
+            future = self._pending.pop(response.get("id"), None)
+        if future is None:
+            if _DEBUG:
+                print("[DEBUG] Dropping uncorrelated response")
+            return
+        if _DEBUG:
+            print(f"[DEBUG] Delivering response id={response.get('id')}")
+        future.set_result(response)
 
     def send_request(self, action, data=None, timeout=10.0):
         """
-        送出請求，並從 background recv 放入的 response_queue 等待回應。
+        送出請求（附上 request id），並等待 background recv 依 id 交回的回應。
         timeout: 等待伺服器回應最大秒數（預設 10 秒）
         """
-        request = {"action": action, "data": data or {}}
-        
-        print(f"[DEBUG] Sending request: {action} with data: {data}")
-        send_message(self.sock, json.dumps(request))
-        print(f"[DEBUG] Request sent, waiting for response...")
+        if action in _CACHEABLE_ACTIONS and self.cache_ttl > 0 and not data:
+            cached = self._cache.get(action)
+            if cached and time.monotonic() - cached[0] < self.cache_ttl:
+                return cached[1]
+
+        resp = self.send_requests([(action, data)], timeout=timeout)[0]
+        if self.cache_ttl > 0 and action in _CACHEABLE_ACTIONS and resp.get("status") == "success":
+            self._cache[action] = (time.monotonic(), resp)
+        return resp
 
-        # 等待 background thread 把回應放進 queue
+    def send_requests(self, requests, timeout=10.0):
+        """
+        一次送出多個請求（pipelining），再依序等待各自的回應。
+
+        requests: [(action, data), ...]；server 依序處理同一連線的請求，
+            整批只需等待約一個 RTT，例如同時刷新房間與線上使用者列表
+        timeout: 整批請求共用的等待秒數（預設 10 秒）
+        Returns: 與 requests 同順序的回應 list
+        """
+        if self._cache and any(action not in _CACHEABLE_ACTIONS for action, _ in requests):
+            self._cache.clear()
+
+        futures = []
+        with self._pending_lock:
+            for _ in requests:
+                req_id = next(self._next_id)
+                future = Future()
+                self._pending[req_id] = future
+                futures.append((req_id, future))
         try:
-            resp = self._response_queue.get(timeout=timeout)
-            print(f"[DEBUG] Got response from queue: {resp}")
-            return resp
-        except Exception as e:
-            # 若超時或其他，擲出 TimeoutError 讓呼叫端處理
-            print(f"[DEBUG] Timeout or error waiting for response: {e}")
-            raise TimeoutError("等待伺服器回應逾時") from e
+            # 先登記再檢查：recv 緒若在此之後才結束，_fail_pending 也會處理到這些 Future
+            if not (self._recv_thread and self._recv_thread.is_alive()):
+                raise ProtocolError("與 Lobby Server 的連線已中斷")
+            for (action, data), (req_id, _) in zip(requests, futures):
+                print(f"[DEBUG] Sending request: {action} (id={req_id}) with data: {data}")
+                self._writer.send_message(_encode_request(action, data, req_id))
+            print(f"[DEBUG] Request sent, waiting for response...")
+
+            # 等待 background thread 把對應 id 的回應交給 Future
+            deadline = time.monotonic() + timeout
+            responses = []
+            for req_id, future in futures:
+                try:
+                    resp = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                except FutureTimeoutError:
+                    # 逾時擲出 TimeoutError 讓呼叫端處理
+                    print(f"[DEBUG] Timeout waiting for response id={req_id}")
+                    raise TimeoutError("等待伺服器回應逾時")
+                print(f"[DEBUG] Got response: {resp}")
+                responses.append(resp)
+            return responses
+        finally:
+            with self._pending_lock:
+                for req_id, _ in futures:
+                    self._pending.pop(req_id, None)
 
     def _handle_notification(self, notif):
-        t = notif.get("type")
-        if t == "game_start":
-            self.pending_replay_request = None
-            self.waiting_for_game = True
-
-            print("\n" + "="*60)
-            print("🎮 遊戲開始！正在自動啟動遊戲...")
-            print("="*60)
-
-            host = notif.get('game_server_host', 'localhost')
-            port = notif.get('game_server_port')
-            room_id = notif.get('room_id')
-
-            self._launch_game_client(host, port, room_id)
-            print("="*60 + "\n")
-            # ✅ 這裡結束，不再詢問 replay
-        elif t == "room_update":
-            action = notif.get("action")
-            uid = notif.get("user_id")
-            if action == "user_joined":
-                print(f"\n📢 玩家 {uid} 加入了房間")
-                # If I'm the host, remind to press 6
-                if self.current_room_id and uid != self.user_id:
-                    print("💡 按 6 開始遊戲\n")
-                else:
-                    print()
-            elif action == "user_left":
-                print(f"\n📢 玩家 {uid} 離開了房間")
-                if self.waiting_for_game and uid != self.user_id:
-                    print("⚠️  其他玩家離開，返回主選單...\n")
-                    self.current_room_id = None
-                    self.is_host = False
-                    self.waiting_for_game = False
-                    self._need_redraw_menu = True   # ✅ 新增：強制主迴圈重繪菜單
-                    print()
-                else:
-                    print()
+        # 依通知類型查表分派到對應的 _on_<type>，未知類型直接忽略
+        handler = self._notification_handlers.get(notif.get("type"))
+        if handler:
+            handler(notif)
+
+    def _on_game_start(self, notif):
+        self.pending_replay_request = None
+        self.waiting_for_game = True
+
+        print(_BAR_OPEN)
+        print("🎮 遊戲開始！正在自動啟動遊戲...")
+        print(_BAR)
+
+        host = notif.get('game_server_host', 'localhost')
+        port = notif.get('game_server_port')
+        room_id = notif.get('room_id')
+
+        self._launch_game_client(host, port, room_id)
+        print(_BAR_CLOSE)
+        # ✅ 這裡結束，不再詢問 replay
+
+    def _on_room_update(self, notif):
+        # 整段訊息先組好再一次寫出，避免每行 print 各自 flush 成一次 write()
+        action = notif.get("action")
+        uid = notif.get("user_id")
+        if action == "user_joined":
+            parts = [f"\n📢 玩家 {uid} 加入了房間\n"]
+            # If I'm the host, remind to press 6
+            if self.current_room_id and uid != self.user_id:
+                parts.append("💡 按 6 開始遊戲\n\n")
+            else:
+                parts.append("\n")
+            _write_out(parts)
+        elif action == "user_left":
+            parts = [f"\n📢 玩家 {uid} 離開了房間\n"]
+            if self.waiting_for_game and uid != self.user_id:
+                parts.append("⚠️  其他玩家離開，返回主選單...\n\n")
+                self.current_room_id = None
+                self.is_host = False
+                self.waiting_for_game = False
+                self._need_redraw_menu = True   # ✅ 新增：強制主迴圈重繪菜單
+            parts.append("\n")
+            _write_out(parts)
 
-        elif t == "invitation":
-            # 如果你也要顯示邀請通知可以在這裡處理
-            from_user = notif.get("from_user_name") or notif.get("from_user_id")
-            room_name = notif.get("room_name")
-            print(f"\n✉️ 收到邀請：{from_user} 邀請你加入房間 {room_name}\n")
-        elif t == "game_ended":
-            room_id = notif.get("room_id")
-            winner = notif.get("winner")
-            results = notif.get("results", {})
-
-            print(f"\n[DEBUG] 收到 game_ended 通知: room_id={room_id}, winner={winner}")
-            self.waiting_for_game = False
+    def _on_invitation(self, notif):
+        # 如果你也要顯示邀請通知可以在這裡處理
+        from_user = notif.get("from_user_name") or notif.get("from_user_id")
+        room_name = notif.get("room_name")
+        print(f"\n✉️ 收到邀請：{from_user} 邀請你加入房間 {room_name}\n")
 
-            print("\n" + "="*60)
-            print("🏁 遊戲結束！")
-            print("="*60)
+    def _on_game_ended(self, notif):
+        room_id = notif.get("room_id")
+        winner = notif.get("winner")
+        results = notif.get("results", {})
 
-            if winner:
-                print(f"🏆 勝利者: Player {winner}")
-            if results:
-                for player, stats in results.items():
-                    print(f"\n{player}:")
-                    print(f"  分數: {stats.get('score', 0)}")
-                    print(f"  消除行數: {stats.get('lines_cleared', 0)}")
+        self.waiting_for_game = False
+
+        # 結算畫面是最大量的輸出，整段組好後一次寫出
+        parts = [
+            f"\n[DEBUG] 收到 game_ended 通知: room_id={room_id}, winner={winner}\n",
+            f"{_BAR_OPEN}\n🏁 遊戲結束！\n{_BAR}\n",
+        ]
+        if winner:
+            parts.append(f"🏆 勝利者: Player {winner}\n")
+        if results:
+            for player, stats in results.items():
+                parts.append(
+                    f"\n{player}:\n"
+                    f"  分數: {stats.get('score', 0)}\n"
+                    f"  消除行數: {stats.get('lines_cleared', 0)}\n"
+                )
+        parts.append(f"{_BAR}\n\n返回主選單...\n\n")
+        _write_out(parts)
 
-            print("="*60)
-            print("\n返回主選單...\n")
+        # ✅ 無條件回主選單（不登出）
+        self.current_room_id = None
+        self.is_host = False
+        self.waiting_for_game = False
+        self.pending_replay_request = None
+        self._need_redraw_menu = True
+
+    def _on_replay_accepted(self, notif):
+        message = notif.get("message", "")
+        print(_BAR_OPEN)
+        print("✅ " + message)
+        print(_BAR_CLOSE)
+        # Set waiting flag - waiting for host to start game
+        self.waiting_for_game = True
+        # ✅ 新增這兩行「純提示」，不自動 start，host 會看到 6/9 的等待選單
+        if self.is_host:
+            print("💡 你是房主：按 6 重新開始，或按 9 離開。")
+        else:
+            print("⏳ 對手同意重玩，等待房主開始。")
+
+    def _on_replay_rejected(self, notif):
+        # 有玩家拒絕重玩
+        message = notif.get("message", "")
+        print(_BAR_OPEN)
+        print("❌ " + message)
+        print(_BAR_CLOSE)
+        # 清除房間狀態但保持登入
+        self.current_room_id = None
+        self.is_host = False
+        self.waiting_for_game = False
 
-            # ✅ 無條件回主選單（不登出）
+    def _on_server_shutdown(self, notif):
+        # 伺服器關閉通知
+        message = notif.get("message", "Server is shutting down")
+        print(_BAR_OPEN)
+        print(f"⚠️  {message}")
+        print(_BAR_CLOSE)
+        # Stop recv loop and exit
+        self._recv_running = False
+        self._should_exit = True
+        sys.exit(0)
+
+    def _on_player_disconnected(self, notif):
+        # 玩家斷線通知 - 處理所有情況
+        disconnected_user_id = notif.get("user_id")
+        room_id = notif.get("room_id")
+        message = notif.get("message", f"玩家 {disconnected_user_id} 已斷線")
+
+        print(_BAR_OPEN)
+        print(f"⚠️  {message}")
+        print(_BAR_CLOSE)
+
+        # Clear ALL room-related state and return to menu
+        # This handles: waiting for game start, during game, waiting for replay, etc.
+        if self.current_room_id or self.waiting_for_game or self.pending_replay_request:
+            print("⚠️  返回主選單...\n")
             self.current_room_id = None
             self.is_host = False
             self.waiting_for_game = False
             self.pending_replay_request = None
+            # Signal to redraw menu
             self._need_redraw_menu = True
 
-        elif t == "replay_accepted":
-            message = notif.get("message", "")
-            print("\n" + "="*60)
-            print("✅ " + message)
-            print("="*60 + "\n")
-            # Set waiting flag - waiting for host to start game
-            self.waiting_for_game = True
-            # ✅ 新增這兩行「純提示」，不自動 start，host 會看到 6/9 的等待選單
-            if self.is_host:
-                print("💡 你是房主：按 6 重新開始，或按 9 離開。")
-            else:
-                print("⏳ 對手同意重玩，等待房主開始。")
-
-        elif t == "replay_rejected":
-            # 有玩家拒絕重玩
-            message = notif.get("message", "")
-            print("\n" + "="*60)
-            print("❌ " + message)
-            print("="*60 + "\n")
-            # 清除房間狀態但保持登入
-            self.current_room_id = None
-            self.is_host = False
-            self.waiting_for_game = False
-        elif t == "server_shutdown":
-            # 伺服器關閉通知
-            message = notif.get("message", "Server is shutting down")
-            print("\n" + "="*60)
-            print(f"⚠️  {message}")
-            print("="*60 + "\n")
-            # Stop recv loop and exit
-            self._recv_running = False
-            self._should_exit = True
-            import sys
-            sys.exit(0)
-        elif t == "player_disconnected":
-            # 玩家斷線通知 - 處理所有情況
-            disconnected_user_id = notif.get("user_id")
-            room_id = notif.get("room_id")
-            message = notif.get("message", f"玩家 {disconnected_user_id} 已斷線")
-
-            print("\n" + "="*60)
-            print(f"⚠️  {message}")
-            print("="*60 + "\n")
-
-            # Clear ALL room-related state and return to menu
-            # This handles: waiting for game start, during game, waiting for replay, etc.
-            if self.current_room_id or self.waiting_for_game or self.pending_replay_request:
-                print("⚠️  返回主選單...\n")
-                self.current_room_id = None
-                self.is_host = False
-                self.waiting_for_game = False
-                self.pending_replay_request = None
-                # Signal to redraw menu
-                self._need_redraw_menu = True
-        else:
-            # 其他通知類型
-            pass
+    def _spawn_game_client(self, host, port, room_id, log_path, spectate=False):
+        """
+        啟動 game_client.py 子行程，stdout / stderr 導向 log_path
+
+        直接沿用目前的直譯器（sys.executable），不必經 PATH 找 python3；
+        log 以 O_APPEND 開啟（replay 時不會蓋掉上一局的紀錄），raw fd 交給子行程
+        繼承後父行程立即關閉，不另外包一層 file 物件，也不會留下開著的 fd。
+        """
+        cmd = [
+            sys.executable,
+            _GAME_CLIENT_PATH,
+            "--host", host,
+            "--port", str(port),
+            "--room-id", str(room_id),
+            "--user-id", str(self.user_id)
+        ]
+        if spectate:
+            cmd.append("--spectate")  # 觀戰模式標記
+        log_fd = os.open(log_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            return subprocess.Popen(cmd, stdout=log_fd, stderr=subprocess.STDOUT)
+        finally:
+            os.close(log_fd)
 
     def _launch_game_client(self, host, port, room_id):
         """自動啟動遊戲客戶端"""
         try:
-            game_client_path = os.path.join(os.path.dirname(__file__), "game_client.py")
-
-            cmd = [
-                "python3",
-                game_client_path,
-                "--host", host,
-                "--port", str(port),
-                "--room-id", str(room_id),
-                "--user-id", str(self.user_id)
-            ]
-
             print(f"🚀 啟動遊戲客戶端...")
             print(f"   Host: {host}")
             print(f"   Port: {port}")
             print(f"   Room: {room_id}")
             print(f"   User: {self.user_name} (ID: {self.user_id})")
 
-            # 創建日誌文件來記錄遊戲客戶端輸出
-            with open(f"game_client_{self.user_id}.log", "w") as log_file:
-                # 等待遊戲結束
-                subprocess.run(
-                    cmd,
-                    stdout=log_file,
-                    stderr=subprocess.STDOUT
-                )
+            # 遊戲客戶端輸出記錄到日誌檔，並等待遊戲結束
+            self._spawn_game_client(host, port, room_id, f"game_client_{self.user_id}.log").wait()
 
             print("\n✅ 遊戲視窗已關閉")
             print(f"📄 遊戲日誌: game_client_{self.user_id}.log\n")
@@ -346,15 +608,16 @@ class InteractiveLobbyClient:
             print(f"python3 game_client.py --host {host} --port {port} --room-id {room_id} --user-id {self.user_id}")
 
     def register_user(self):
-        print("\n" + "="*60)
-        print("註冊")
-        print("="*60)
+        sys.stdout.write(_REGISTER_BANNER)
         name = input("姓名: ").strip()
         email = input("Email: ").strip()
         password = input("密碼: ").strip()
         if not name or not email or not password:
             print("❌ 欄位不可空白")
             return False
+        if not _EMAIL_RE.match(email):
+            print("❌ Email 格式不正確")
+            return False
 
         try:
             resp = self.send_request("register", {"name": name, "email": email, "password": password})
@@ -369,9 +632,7 @@ class InteractiveLobbyClient:
             return False
 
     def login_user(self):
-        print("\n" + "="*60)
-        print("登入")
-        print("="*60)
+        sys.stdout.write(_LOGIN_BANNER)
         email = input("Email: ").strip()
         password = input("密碼: ").strip()
         if not email or not password:
@@ -395,14 +656,11 @@ class InteractiveLobbyClient:
                 return False
         except Exception as e:
             print(f"❌ 錯誤: {e}")
-            import traceback
             traceback.print_exc()
             return False
 
     def create_room(self):
-        print("\n" + "="*60)
-        print("建立房間")
-        print("="*60)
+        sys.stdout.write(_CREATE_ROOM_BANNER)
         room_name = input("房間名稱: ").strip()
         if not room_name:
             print("❌ 房間名稱不可空白")
@@ -445,14 +703,11 @@ class InteractiveLobbyClient:
             return None
         except Exception as e:
             print(f"❌ 錯誤: {e}")
-            import traceback
             traceback.print_exc()
             return None
 
     def join_room(self):
-        print("\n" + "="*60)
-        print("加入房間")
-        print("="*60)
+        sys.stdout.write(_JOIN_ROOM_BANNER)
         room_id = input("房間 ID: ").strip()
         if not room_id:
             print("❌ 房間 ID 不可空白")
@@ -463,6 +718,9 @@ class InteractiveLobbyClient:
         except ValueError:
             print("❌ 房間 ID 必須是數字")
             return False
+        if room_id <= 0:
+            print("❌ 房間 ID 必須是正整數")
+            return False
 
         try:
             resp = self.send_request("join_room", {"room_id": room_id})
@@ -484,9 +742,7 @@ class InteractiveLobbyClient:
             print("\n❌ 你必須先在房間中！")
             return None
 
-        print("\n" + "="*60)
-        print("啟動遊戲")
-        print("="*60)
+        sys.stdout.write(_START_GAME_BANNER)
 
         try:
             resp = self.send_request("start_game", {"room_id": self.current_room_id})
@@ -509,7 +765,6 @@ class InteractiveLobbyClient:
 
         except Exception as e:
             print(f"❌ 錯誤: {e}")
-            import traceback
             traceback.print_exc()
             return None
 
@@ -536,44 +791,48 @@ class InteractiveLobbyClient:
             return False
 
     def list_online_users(self):
-        print("\n" + "="*60)
-        print("線上使用者")
-        print("="*60)
+        sys.stdout.write(_ONLINE_USERS_BANNER)
         try:
             resp = self.send_request("list_online_users")
             if resp.get("status") == "success":
                 users = resp["data"]
                 if not users:
                     print("沒有其他使用者在線上")
+                    print()
                 else:
-                    print(f"\n共 {len(users)} 位使用者在線上:\n")
-                    for user in users:
-                        print(f"  {user['name']} (ID: {user['user_id']})")
-                print()
+                    # 整份列表組成一個字串一次寫出，不逐行 print
+                    sys.stdout.write(
+                        f"\n共 {len(users)} 位使用者在線上:\n\n"
+                        + "".join(f"  {user['name']} (ID: {user['user_id']})\n" for user in users)
+                        + "\n"
+                    )
             else:
                 print(f"❌ 取得列表失敗: {resp.get('message')}")
         except Exception as e:
             print(f"❌ 錯誤: {e}")
 
     def list_rooms(self):
-        print("\n" + "="*60)
-        print("公開房間列表")
-        print("="*60)
+        sys.stdout.write(_ROOM_LIST_BANNER)
         try:
             resp = self.send_request("list_rooms")
             if resp.get("status") == "success":
                 rooms = resp["data"]
                 if not rooms:
                     print("目前沒有公開房間")
+                    print()
                 else:
-                    print(f"\n共 {len(rooms)} 個公開房間:\n")
-                    for room in rooms:
-                        print(f"  房間 ID: {room['id']}")
-                        print(f"  名稱: {room['name']}")
-                        print(f"  狀態: {room['status']}")
-                        print(f"  目前人數: {room.get('current_members', 0)}/2")
-                        print()
-                print()
+                    # 整份列表組成一個字串一次寫出，不逐行 print
+                    sys.stdout.write(
+                        f"\n共 {len(rooms)} 個公開房間:\n\n"
+                        + "".join(
+                            f"  房間 ID: {room['id']}\n"
+                            f"  名稱: {room['name']}\n"
+                            f"  狀態: {room['status']}\n"
+                            f"  目前人數: {room.get('current_members', 0)}/2\n\n"
+                            for room in rooms
+                        )
+                        + "\n"
+                    )
             else:
                 print(f"❌ 取得房間列表失敗: {resp.get('message')}")
         except Exception as e:
@@ -581,9 +840,7 @@ class InteractiveLobbyClient:
 
     def spectate_game(self):
         """觀戰遊戲"""
-        print("\n" + "="*60)
-        print("觀戰遊戲")
-        print("="*60)
+        sys.stdout.write(_SPECTATE_BANNER)
 
         # 顯示正在進行中的房間
         try:
@@ -599,11 +856,10 @@ class InteractiveLobbyClient:
                 print("\n目前沒有正在進行的遊戲")
                 return
 
-            print(f"\n共 {len(playing_rooms)} 個正在進行的遊戲:\n")
-            for room in playing_rooms:
-                print(f"  房間 ID: {room['id']}")
-                print(f"  名稱: {room['name']}")
-                print()
+            sys.stdout.write(
+                f"\n共 {len(playing_rooms)} 個正在進行的遊戲:\n\n"
+                + "".join(f"  房間 ID: {room['id']}\n  名稱: {room['name']}\n\n" for room in playing_rooms)
+            )
 
             room_id = input("請輸入要觀戰的房間 ID: ").strip()
             if not room_id:
@@ -614,6 +870,9 @@ class InteractiveLobbyClient:
             except ValueError:
                 print("❌ 房間 ID 必須是數字")
                 return
+            if room_id <= 0:
+                print("❌ 房間 ID 必須是正整數")
+                return
 
             # 取得遊戲伺服器資訊
             resp = self.send_request("spectate_game", {"room_id": room_id})
@@ -633,30 +892,12 @@ class InteractiveLobbyClient:
     def _launch_spectator_client(self, host, port, room_id):
         """啟動觀戰客戶端"""
         try:
-            game_client_path = os.path.join(os.path.dirname(__file__), "game_client.py")
-
-            cmd = [
-                "python3",
-                game_client_path,
-                "--host", host,
-                "--port", str(port),
-                "--room-id", str(room_id),
-                "--user-id", str(self.user_id),
-                "--spectate"  # 觀戰模式標記
-            ]
-
             print(f"🚀 啟動觀戰視窗...")
             print(f"   Host: {host}")
             print(f"   Port: {port}")
             print(f"   Room: {room_id}")
 
-            log_file = open(f"spectator_{self.user_id}.log", "w")
-
-            subprocess.Popen(
-                cmd,
-                stdout=log_file,
-                stderr=subprocess.STDOUT
-            )
+            self._spawn_game_client(host, port, room_id, f"spectator_{self.user_id}.log", spectate=True)
 
             print("✅ 觀戰視窗應該已經開啟！")
             print(f"📄 觀戰日誌: spectator_{self.user_id}.log\n")
@@ -664,72 +905,91 @@ class InteractiveLobbyClient:
         except Exception as e:
             print(f"❌ 無法啟動觀戰視窗: {e}")
 
+    def _close_ui_wake_pipe(self):
+        # 接收緒離開前還會寫入 _ui_wake_w 叫醒主迴圈，所以只在它結束後才關閉
+        if self._recv_thread and self._recv_thread.is_alive():
+            return
+        for fd in (self._ui_wake_r, self._ui_wake_w):
+            if fd is not None:
+                os.close(fd)
+        self._ui_wake_r = self._ui_wake_w = None
+
     def close(self):
         if not self.sock:
+            self._close_ui_wake_pipe()
             return
-        # 1) 盡力送登出，但「不要等回覆」
+        # 1) 先告知接收緒停下來（wake socket 會立即叫醒它）；必須在送 logout 之前，
+        #    否則它可能先讀到 server 關閉連線的 EOF，誤判成意外斷線
+        self._stop_recv_thread()
+
+        # 2) 盡力送登出，但「不要等回覆」；寫入最多等 200 ms，server 卡住時也不會拖住關閉
         try:
-            send_message(self.sock, json.dumps({"action": "logout", "data": {}}))
+            self.sock.settimeout(0.2)
+            self._writer.send_frame(_LOGOUT_FRAME)
         except Exception:
             pass
 
-        # 2) 告知接收緒停下來
-        self._recv_running = False
-
-        # 3) 中斷阻塞中的 recv（讓 _recv_loop 優雅退出）
+        # 3) 半關閉：logout 之後緊接 FIN，server 讀完 logout 就會看到 EOF
         try:
-            self.sock.shutdown(socket.SHUT_RDWR)
+            self.sock.shutdown(socket.SHUT_WR)
         except Exception:
             pass
 
         # 4) 等接收緒結束一小下
         try:
             if self._recv_thread and self._recv_thread.is_alive():
-                self._recv_thread.join(timeout=0.5)
+                self._recv_thread.join(timeout=0.2)
         except Exception:
             pass
 
-        # 5) 關心跳（如果有啟）
-        try:
-            self._stop_heartbeat_thread()
-        except Exception:
-            pass
-
-        # 6) 最後關 socket
+        # 5) 最後關 socket
         try:
             self.sock.close()
         except Exception:
             pass
 
         self.sock = None
+        self._close_wake_pair()
+        self._close_ui_wake_pipe()
+
+def _menu_action(method, needs_login=False):
+    """把 client 方法包成選單動作：(client, logged_in) -> 新的 logged_in"""
+    def action(client, logged_in):
+        if needs_login and not logged_in:
+            print("\n❌ You must login first!")
+        else:
+            method(client)
+        return logged_in
+    return action
+
+
+# 主選單選項 → 動作（查表取代 if/elif 逐一比對；9 = 離開由 main 處理）
+_MENU_ACTIONS = {
+    "1": _menu_action(InteractiveLobbyClient.register_user),
+    "2": lambda client, logged_in: bool(client.login_user()) or logged_in,
+    "3": _menu_action(InteractiveLobbyClient.create_room, needs_login=True),
+    "4": _menu_action(InteractiveLobbyClient.list_rooms),
+    "5": _menu_action(InteractiveLobbyClient.join_room, needs_login=True),
+    "6": _menu_action(InteractiveLobbyClient.start_game, needs_login=True),
+    "7": _menu_action(InteractiveLobbyClient.list_online_users, needs_login=True),
+    "8": _menu_action(InteractiveLobbyClient.spectate_game, needs_login=True),
+}
+
 
 def print_menu():
-    """Print main menu"""
-    print("\n" + "="*60)
-    print("LOBBY MENU")
-    print("="*60)
-    print("1. Register new account")
-    print("2. Login")
-    print("3. Create room")
-    print("4. List public rooms")
-    print("5. Join room (as player)")
-    print("6. Start game (host only)")
-    print("7. List online users")
-    print("8. Spectate game (watch only)")
-    print("9. Exit")
-    print("="*60)
+    """Print main menu（連同輸入提示，一次寫出）"""
+    sys.stdout.write(_MENU)
+    sys.stdout.flush()
 
 
 def main(host='140.113.17.11', port=14931):
     """Main interactive loop"""
-    print("="*60)
-    print("WELCOME TO TETRIS LOBBY")
-    print("="*60)
-    print()
+    sys.stdout.write(_WELCOME_BANNER)
 
     client = InteractiveLobbyClient(host=host, port=port)
 
     if not client.connect():
+        client.close()
         return
 
     logged_in = False
@@ -744,9 +1004,9 @@ def main(host='140.113.17.11', port=14931):
             # 檢查是否有待處理的 replay 請求
             # if client.pending_replay_request:
             #     room_id = client.pending_replay_request["room_id"]
-            #     print("\n" + "="*60)
+            #     print(_BAR_OPEN)
             #     print("⚠️  等待您的 REPLAY 回應")
-            #     print("="*60)
+            #     print(_BAR)
             #     replay_choice = input("是否要重新對戰？ (y/n): ").strip().lower()
 
             #     want_replay = (replay_choice == 'y')
@@ -781,20 +1041,16 @@ def main(host='140.113.17.11', port=14931):
             if client.waiting_for_game:
                 # 如果是房主，顯示簡化選單（只有開始遊戲選項）
                 if client.is_host and client.current_room_id:
-                    print("\n" + "="*60)
-                    print("等待中 - 房主控制")
-                    print("="*60)
-                    print("6. 開始遊戲")
-                    print("9. 離開房間")
-                    print("="*60)
-
-                    print("\n輸入選項: ", end='', flush=True)
-
-                    # Use non-blocking polling to allow replay prompt to interrupt
-                    import sys
-                    import select
+                    sys.stdout.write(_HOST_WAIT_MENU)
+                    sys.stdout.flush()
 
+                    # 阻塞等待輸入；通知到達時被叫醒，重新檢查旗標
                     while True:
+                        # 連線中斷或 server 關閉 → 回到外層結束
+                        if client._should_exit:
+                            choice = None
+                            break
+
                         # Check if replay request arrived while waiting for input
                         if client.pending_replay_request:
                             print()  # New line after the prompt
@@ -806,17 +1062,9 @@ def main(host='140.113.17.11', port=14931):
                             choice = None
                             break
 
-                        # Check if input is available
-                        if hasattr(select, 'select'):
-                            ready, _, _ = select.select([sys.stdin], [], [], 0.1)
-                            if ready:
-                                choice = sys.stdin.readline().strip()
-                                break
-                        else:
-                            # Fallback for Windows
-                            import time
-                            time.sleep(0.1)
-                            continue
+                        choice = client.wait_for_input()
+                        if choice is not None:
+                            break
 
                     # If we broke out due to replay request, continue to handle it
                     if client.pending_replay_request:
@@ -832,21 +1080,19 @@ def main(host='140.113.17.11', port=14931):
                         client.leave_room()
                     continue
                 else:
-                    # 非房主，只是安靜等待
-                    import time
-                    time.sleep(0.1)  # 短暫休息避免 busy loop
+                    # 非房主，只是安靜等待下一個通知
+                    client.wait_for_input(watch_stdin=False)
                     continue
 
             print_menu()
 
-            # Use a non-blocking approach to check for pending_replay_request
-            import sys
-            import select
-
-            print("\nEnter your choice (1-9): ", end='', flush=True)
-
-            # Poll for input with timeout to allow checking for replay requests
+            # 阻塞等待輸入；通知到達時被叫醒，檢查重繪 / replay 請求
             while True:
+                # 連線中斷或 server 關閉 → 回到外層結束
+                if client._should_exit:
+                    choice = None
+                    break
+
                 # Check if menu needs redrawing due to notification
                 if client._need_redraw_menu:
                     client._need_redraw_menu = False
@@ -859,79 +1105,28 @@ def main(host='140.113.17.11', port=14931):
                     print()  # New line after the prompt
                     break
 
-                # Check if input is available (Unix-like systems)
-                if hasattr(select, 'select'):
-                    ready, _, _ = select.select([sys.stdin], [], [], 0.1)
-                    if ready:
-                        choice = sys.stdin.readline().strip()
-                        break
-                else:
-                    # For Windows or systems without select, just use input with timeout handling
-                    # This is a fallback - won't be as responsive
-                    try:
-                        choice = input()
-                        break
-                    except:
-                        import time
-                        time.sleep(0.1)
-                        continue
+                choice = client.wait_for_input()
+                if choice is not None:
+                    break
 
             # If we broke out due to replay request or menu redraw, continue
             if client.pending_replay_request or not choice:
                 continue
 
-            if choice == "1":
-                client.register_user()
-
-            elif choice == "2":
-                if client.login_user():
-                    logged_in = True
-
-            elif choice == "3":
-                if not logged_in:
-                    print("\n❌ You must login first!")
-                else:
-                    client.create_room()
-
-            elif choice == "4":
-                client.list_rooms()
-
-            elif choice == "5":
-                if not logged_in:
-                    print("\n❌ You must login first!")
-                else:
-                    client.join_room()
-
-            elif choice == "6":
-                if not logged_in:
-                    print("\n❌ You must login first!")
-                else:
-                    client.start_game()
-
-            elif choice == "7":
-                if not logged_in:
-                    print("\n❌ You must login first!")
-                else:
-                    client.list_online_users()
-
-            elif choice == "8":
-                if not logged_in:
-                    print("\n❌ You must login first!")
-                else:
-                    client.spectate_game()
-
-            elif choice == "9":
+            if choice == "9":
                 print("\n👋 Goodbye!")
                 break
 
-            else:
+            action = _MENU_ACTIONS.get(choice)
+            if action is None:
                 print("\n❌ Invalid choice. Please enter 1-9.")
+            else:
+                logged_in = action(client, logged_in)
 
     except KeyboardInterrupt:
         print("\n\n👋 Goodbye!")
     except Exception as e:
         print(f"\n❌ Unexpected error: {e}")
-        import traceback
         traceback.print_exc()
     finally:
         client.close()
@@ -5,47 +5,42 @@ This automates the lobby connection and launches game clients
 """
 
 import subprocess
-import time
 import sys
-from test_lobby_client import LobbyClient
+import threading
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# 這裡只看流程結果，不需要每個回應的完整 JSON（要看可設 LOBBY_VERBOSE=1）
+os.environ.setdefault("LOBBY_VERBOSE", "0")
+from test_lobby_client import LobbyClient, TEST_PLAYERS
+
+_RULE = "=" * 60
+# 以絕對路徑啟動 game client，不受目前工作目錄影響
+_GAME_CLIENT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "game_client.py")
 
 def test_game():
     """Quick test of the full game flow"""
 
-    print("=" * 60)
-    print("🎮 Tetris Game Quick Test")
-    print("=" * 60)
-    print()
+    # 連續多行輸出合併成一次 print（TTY 上每次 print 都會 flush）
+    print(f"{_RULE}\n🎮 Tetris Game Quick Test\n{_RULE}\n")
 
     # Create two clients
     alice = LobbyClient()
     bob = LobbyClient()
+    game_procs = []
 
     try:
-        # Connect
-        print("📡 Connecting to Lobby Server...")
-        if not alice.connect() or not bob.connect():
-            print("❌ Failed to connect to Lobby Server")
-            print("   Make sure Lobby Server is running:")
-            print("   cd lobby_server && python3 lobby_server.py")
-            return
-
-        # Register (may fail if already exists, that's ok)
-        print("📝 Registering users...")
-        alice.register("TestAlice", "testalice@test.com", "testpass")
-        bob.register("TestBob", "testbob@test.com", "testpass")
-
-        # Login
-        print("🔐 Logging in...")
-        if not alice.login("testalice@test.com", "testpass"):
-            print("❌ Alice login failed")
-            return
-        if not bob.login("testbob@test.com", "testpass"):
-            print("❌ Bob login failed")
+        # Alice 與 Bob 在建立房間前互不相依 → 兩邊同時 連線 → 註冊 → 登入
+        print("📡 Connecting, registering and logging in...")
+        with ThreadPoolExecutor(max_workers=2) as ex:
+            ready = all(ex.map(lambda c, player: c.bootstrap(*player), (alice, bob), TEST_PLAYERS))
+        if not ready:
+            print("❌ Failed to set up players on Lobby Server\n"
+                  "   Make sure Lobby Server is running:\n"
+                  "   cd lobby_server && python3 lobby_server.py")
             return
 
-        print(f"✅ Alice ID: {alice.user_id}")
-        print(f"✅ Bob ID: {bob.user_id}")
+        print(f"✅ Alice ID: {alice.user_id}\n✅ Bob ID: {bob.user_id}")
 
         # Create room
         print("\n🏠 Creating game room...")
@@ -75,20 +70,17 @@ def test_game():
         game_host = response["data"]["game_server_host"]
         game_port = response["data"]["game_server_port"]
 
-        print(f"✅ Game Server started: {game_host}:{game_port}")
-        print()
+        print(f"✅ Game Server started: {game_host}:{game_port}\n")
 
-        # Wait for game server to be ready
-        print("⏳ Waiting for Game Server to initialize...")
-        time.sleep(2)
+        # 不另外等待：Lobby 回覆 start_game 前已確認 Game Server 行程啟動成功；
+        # 也不能先連線探測，Game Server 只 accept 兩條連線，探測會佔掉玩家的位置
 
         # Launch game clients
-        print("\n🚀 Launching game clients...")
-        print("   (Close the pygame windows to exit)")
-        print()
+        print("\n🚀 Launching game clients...\n"
+              "   (Close the pygame windows to exit)\n")
 
         alice_cmd = [
-            "python3", "game_client.py",
+            sys.executable, _GAME_CLIENT,
             "--host", game_host,
             "--port", str(game_port),
             "--room-id", str(room_id),
@@ -96,31 +88,20 @@ def test_game():
         ]
 
         bob_cmd = [
-            "python3", "game_client.py",
+            sys.executable, _GAME_CLIENT,
             "--host", game_host,
             "--port", str(game_port),
             "--room-id", str(room_id),
             "--user-id", str(bob.user_id)
         ]
 
-        print(f"🎮 Player 1 (Alice): {' '.join(alice_cmd)}")
-        print(f"🎮 Player 2 (Bob): {' '.join(bob_cmd)}")
-        print()
-
-        # Launch clients (they will run in foreground)
-        # Note: In real testing, you'd launch these in separate terminals
-        print("⚠️  Note: Launch these commands in separate terminals:")
-        print()
-        print("Terminal 1:")
-        print(f"  {' '.join(alice_cmd)}")
-        print()
-        print("Terminal 2:")
-        print(f"  {' '.join(bob_cmd)}")
-        print()
-
-        print("✅ Test setup complete!")
-        print()
-        print("=" * 60)
+        print(f"🎮 Player 1 (Alice): {' '.join(alice_cmd)}\n"
+              f"🎮 Player 2 (Bob): {' '.join(bob_cmd)}\n")
+
+        # 兩個 game client 同時啟動，各自的 pygame 初始化互相重疊
+        game_procs = [subprocess.Popen(alice_cmd), subprocess.Popen(bob_cmd)]
+
+        print(f"✅ Test setup complete!\n\n{_RULE}")
 
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -129,14 +110,23 @@ def test_game():
 
     finally:
         # Keep connections alive
-        print("\n💡 Press Ctrl+C to cleanup and exit...")
+        if game_procs:
+            print("\n💡 Close the pygame windows or press Ctrl+C to cleanup and exit...")
+        else:
+            print("\n💡 Press Ctrl+C to cleanup and exit...")
         try:
-            while True:
-                time.sleep(1)
+            if game_procs:
+                for proc in game_procs:
+                    proc.wait()
+            else:
+                # 單次阻塞等待直到 Ctrl+C，不必每秒醒來一次
+                threading.Event().wait()
         except KeyboardInterrupt:
-            print("\n👋 Cleaning up...")
-            alice.close()
-            bob.close()
+            for proc in game_procs:
+                proc.terminate()
+        print("\n👋 Cleaning up...")
+        alice.close()
+        bob.close()
 
 
 if __name__ == "__main__":
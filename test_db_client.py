@@ -16,10 +16,18 @@ def test_db_server():
     print("=" * 50)
     
     try:
-        # 連線到 DB Server
+        # 連線到 DB Server（直接用 IPv4 位址，不必經過 localhost 的名稱解析）
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.connect(('localhost', 10001))
-        print("✅ 成功連線到 DB Server (localhost:10001)\n")
+        # 連線逾時：server 沒在跑（或封包被丟棄）時 2 秒內失敗，不必等 OS 的 SYN 重送（可達 2 分鐘）
+        sock.settimeout(2.0)
+        try:
+            sock.connect(('127.0.0.1', 10001))
+        except socket.timeout:
+            raise ConnectionRefusedError("連線逾時")
+        sock.settimeout(None)  # 之後的請求維持阻塞模式
+        # 關閉 Nagle：小型 JSON 請求立即送出，不等 delayed ACK
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        print("✅ 成功連線到 DB Server (127.0.0.1:10001)\n")
         
         # ========== 測試 1: 建立使用者 ==========
         print("測試 1: 建立使用者")
@@ -44,18 +52,53 @@ def test_db_server():
             print(f"❌ 建立使用者失敗\n")
             return
         
+        # ========== 測試 2~5 ==========
+        # 這四個請求只依賴測試 1 的 user_id、彼此互不相依：
+        # 一次全部送出（pipelining），再依序收回應 → 4 個 RTT 變成約 1 個
+        # （DB Server 依序處理同一連線的請求，回應順序與送出順序相同）
+        requests = [
+            {
+                "collection": "User",
+                "action": "query",
+                "data": {
+                    "filters": {"email": "alice@example.com"}
+                }
+            },
+            {
+                "collection": "User",
+                "action": "update",
+                "data": {
+                    "id": user_id,
+                    "updates": {
+                        "name": "Alice Updated"
+                    }
+                }
+            },
+            {
+                "collection": "Room",
+                "action": "create",
+                "data": {
+                    "name": "Test Room",
+                    "host_user_id": user_id,
+                    "visibility": "public",
+                    "status": "idle"
+                }
+            },
+            {
+                "collection": "Room",
+                "action": "query",
+                "data": {
+                    "filters": {"visibility": "public"}
+                }
+            },
+        ]
+        for request in requests:
+            send_message(sock, json.dumps(request))
+        responses = [json.loads(recv_message(sock)) for _ in requests]
+        
         # ========== 測試 2: 查詢使用者 ==========
         print("測試 2: 查詢使用者 (by email)")
-        request = {
-            "collection": "User",
-            "action": "query",
-            "data": {
-                "filters": {"email": "alice@example.com"}
-            }
-        }
-        send_message(sock, json.dumps(request))
-        response_str = recv_message(sock)
-        response = json.loads(response_str)
+        response = responses[0]
         print(f"回應: {json.dumps(response, indent=2, ensure_ascii=False)}\n")
         
         if response.get("status") == "success" and len(response["data"]) > 0:
@@ -65,19 +108,7 @@ def test_db_server():
         
         # ========== 測試 3: 更新使用者 ==========
         print("測試 3: 更新使用者")
-        request = {
-            "collection": "User",
-            "action": "update",
-            "data": {
-                "id": user_id,
-                "updates": {
-                    "name": "Alice Updated"
-                }
-            }
-        }
-        send_message(sock, json.dumps(request))
-        response_str = recv_message(sock)
-        response = json.loads(response_str)
+        response = responses[1]
         print(f"回應: {json.dumps(response, indent=2, ensure_ascii=False)}\n")
         
         if response.get("status") == "success":
@@ -87,19 +118,7 @@ def test_db_server():
         
         # ========== 測試 4: 建立房間 ==========
         print("測試 4: 建立房間")
-        request = {
-            "collection": "Room",
-            "action": "create",
-            "data": {
-                "name": "Test Room",
-                "host_user_id": user_id,
-                "visibility": "public",
-                "status": "idle"
-            }
-        }
-        send_message(sock, json.dumps(request))
-        response_str = recv_message(sock)
-        response = json.loads(response_str)
+        response = responses[2]
         print(f"回應: {json.dumps(response, indent=2, ensure_ascii=False)}\n")
         
         if response.get("status") == "success":
@@ -110,16 +129,7 @@ def test_db_server():
         
         # ========== 測試 5: 查詢公開房間 ==========
         print("測試 5: 查詢公開房間")
-        request = {
-            "collection": "Room",
-            "action": "query",
-            "data": {
-                "filters": {"visibility": "public"}
-            }
-        }
-        send_message(sock, json.dumps(request))
-        response_str = recv_message(sock)
-        response = json.loads(response_str)
+        response = responses[3]
         print(f"回應: {json.dumps(response, indent=2, ensure_ascii=False)}\n")
         
         if response.get("status") == "success":
@@ -4,50 +4,41 @@ Test script to setup a game and verify it works
 """
 
 import sys
-import time
-from test_lobby_client import LobbyClient
+import os
+import asyncio
 
-def main():
-    print("=" * 60)
-    print("🎮 Testing Game Setup")
-    print("=" * 60)
-    print()
+# 這裡只看流程結果，不需要每個回應的完整 JSON（要看可設 LOBBY_VERBOSE=1）
+os.environ.setdefault("LOBBY_VERBOSE", "0")
+from test_lobby_client import AsyncLobbyClient, TEST_PLAYERS
 
-    # Create two clients
-    alice = LobbyClient()
-    bob = LobbyClient()
+_RULE = "=" * 60
 
-    try:
-        # Connect
-        print("📡 Connecting to Lobby Server...")
-        if not alice.connect():
-            print("❌ Alice: Failed to connect")
-            return False
-        if not bob.connect():
-            print("❌ Bob: Failed to connect")
-            return False
-        print("✅ Both clients connected")
+async def _setup():
+    # 連續多行輸出合併成一次 print（TTY 上每次 print 都會 flush）
+    print(f"{_RULE}\n🎮 Testing Game Setup\n{_RULE}\n")
 
-        # Register (may fail if already exists, that's ok)
-        print("\n📝 Registering users...")
-        alice.register("TestAlice", "testalice@test.com", "testpass")
-        bob.register("TestBob", "testbob@test.com", "testpass")
+    # Create two clients（asyncio：同一執行緒內兩邊的 RTT 重疊，不需要額外執行緒）
+    alice = AsyncLobbyClient()
+    bob = AsyncLobbyClient()
 
-        # Login
-        print("\n🔐 Logging in...")
-        if not alice.login("testalice@test.com", "testpass"):
-            print("❌ Alice login failed")
+    try:
+        # Alice 與 Bob 在建立房間前互不相依 → 兩邊同時 連線 → 註冊 → 登入
+        print("📡 Connecting, registering and logging in...")
+        alice_ok, bob_ok = await asyncio.gather(*(
+            client.bootstrap(*player) for client, player in zip((alice, bob), TEST_PLAYERS)
+        ))
+        if not alice_ok:
+            print("❌ Alice: Failed to set up")
             return False
-        if not bob.login("testbob@test.com", "testpass"):
-            print("❌ Bob login failed")
+        if not bob_ok:
+            print("❌ Bob: Failed to set up")
             return False
 
-        print(f"✅ Alice ID: {alice.user_id}")
-        print(f"✅ Bob ID: {bob.user_id}")
+        print(f"✅ Alice ID: {alice.user_id}\n✅ Bob ID: {bob.user_id}")
 
         # Create room
         print("\n🏠 Creating game room...")
-        response = alice.create_room("Test Game", "public")
+        response = await alice.create_room("Test Game", "public")
         if response.get("status") != "success":
             print(f"❌ Failed to create room: {response.get('message')}")
             return False
@@ -57,7 +48,7 @@ def main():
 
         # Bob joins
         print("\n🚪 Bob joining room...")
-        response = bob.join_room(room_id)
+        response = await bob.join_room(room_id)
         if response.get("status") != "success":
             print(f"❌ Failed to join room: {response.get('message')}")
             return False
@@ -65,7 +56,7 @@ def main():
 
         # Start game
         print("\n🎮 Starting game...")
-        response = alice.send_request("start_game", {"room_id": room_id})
+        response = await alice.send_request("start_game", {"room_id": room_id})
         if response.get("status") != "success":
             print(f"❌ Failed to start game: {response.get('message')}")
             return False
@@ -75,22 +66,15 @@ def main():
 
         print(f"✅ Game Server started: {game_host}:{game_port}")
 
-        # Wait a bit for game server to fully initialize
-        print("\n⏳ Waiting for Game Server to initialize...")
-        time.sleep(3)
-
-        print("\n" + "=" * 60)
-        print("✅ ALL TESTS PASSED!")
-        print("=" * 60)
-        print()
-        print("To play the game, run these commands in 2 separate terminals:")
-        print()
-        print(f"Terminal 1 (Alice):")
-        print(f"  python3 game_client.py --host {game_host} --port {game_port} --room-id {room_id} --user-id {alice.user_id}")
-        print()
-        print(f"Terminal 2 (Bob):")
-        print(f"  python3 game_client.py --host {game_host} --port {game_port} --room-id {room_id} --user-id {bob.user_id}")
-        print()
+        # 不另外等待：Lobby 回覆 start_game 前已確認 Game Server 行程啟動成功；
+        # 也不能先連線探測，Game Server 只 accept 兩條連線，探測會佔掉玩家的位置
+
+        print(f"\n{_RULE}\n✅ ALL TESTS PASSED!\n{_RULE}\n\n"
+              "To play the game, run these commands in 2 separate terminals:\n\n"
+              "Terminal 1 (Alice):\n"
+              f"  python3 game_client.py --host {game_host} --port {game_port} --room-id {room_id} --user-id {alice.user_id}\n\n"
+              "Terminal 2 (Bob):\n"
+              f"  python3 game_client.py --host {game_host} --port {game_port} --room-id {room_id} --user-id {bob.user_id}\n")
 
         return True
 
@@ -102,8 +86,11 @@ def main():
 
     finally:
         # Cleanup
-        alice.close()
-        bob.close()
+        await asyncio.gather(alice.close(), bob.close())
+
+
+def main():
+    return asyncio.run(_setup())
 
 
 if __name__ == "__main__":
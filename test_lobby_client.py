@@ -4,26 +4,88 @@ import json
 import sys
 import os
 import time
+import asyncio
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 
 # 加入 lobby_server 到路徑
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lobby_server'))
-from protocol import send_message, recv_message, ProtocolError
+from protocol import (send_message, recv_message, ProtocolError, send_message_async,
+                      recv_message_async)
+
+# 請求 / 回應的 JSON 編解碼：有 orjson 就用（較快，直接產生 UTF-8 bytes），否則退回標準庫 json
+try:
+    import orjson
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+
+    def _pretty(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode('utf-8')
+except ImportError:
+    _dumps = json.dumps
+    _loads = json.loads
+
+    def _pretty(obj):
+        return json.dumps(obj, indent=2, ensure_ascii=False)
+
+# 是否印出每個回應的完整 JSON（LOBBY_VERBOSE=0 可關閉；腳本化的測試流程預設關閉）
+VERBOSE = os.environ.get("LOBBY_VERBOSE", "1") == "1"
+
+
+def _print_response(response):
+    if VERBOSE:
+        print(f"回應: {_pretty(response)}\n")
+
+# 不帶參數的請求內容固定，預先編好，送出時不必再序列化
+_EMPTY_REQUESTS = {
+    action: _dumps({"action": action, "data": {}})
+    for action in ("list_rooms", "list_online_users", "logout")
+}
+
+# 連線逾時秒數（server 沒在跑時快速失敗）
+CONNECT_TIMEOUT = 2.0
+
+# 測試報告的分隔線（連續多行輸出合併成一次 print，TTY 上每次 print 都會 flush）
+_RULE = "=" * 60
+_THIN_RULE = "-" * 60
+
+# quick_test_game / test_game_setup 共用的兩位測試玩家：(name, email, password)
+TEST_PLAYERS = (
+    ("TestAlice", "testalice@test.com", "testpass"),
+    ("TestBob", "testbob@test.com", "testpass"),
+)
+
 
 class LobbyClient:
     """Lobby Server 測試客戶端"""
     
-    def __init__(self, host='localhost', port=10002):
+    # 預設直接用 IPv4 位址：connect 時不必為 localhost 做名稱解析（讀 /etc/hosts 等）
+    def __init__(self, host='127.0.0.1', port=10002):
         self.host = host
         self.port = port
         self.sock = None
         self.user_id = None
         self.user_name = None
+        # 每個 client 重複使用的接收 buffer（recv_into 直接寫入，不足時自動放大）
+        self._rxbuf = bytearray(4096)
     
     def connect(self):
         """連線到 Lobby Server"""
         try:
             self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.sock.connect((self.host, self.port))
+            # 連線逾時：server 沒在跑（或封包被丟棄）時快速失敗，不必等 OS 的 SYN 重送（可達 2 分鐘）
+            self.sock.settimeout(CONNECT_TIMEOUT)
+            try:
+                self.sock.connect((self.host, self.port))
+            except socket.timeout:
+                raise ConnectionRefusedError(f"連線逾時（{CONNECT_TIMEOUT} 秒），請確認 Lobby Server 是否已啟動")
+            self.sock.settimeout(None)  # 之後的請求維持阻塞模式
+            # 關閉 Nagle：小型 JSON 請求立即送出，不等 delayed ACK
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            # TCP keepalive：閒置的連線若對端已消失，kernel 會偵測到並讓它失效
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            if hasattr(socket, "TCP_KEEPIDLE"):
+                self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 60)
             print(f"✅ 成功連線到 Lobby Server ({self.host}:{self.port})\n")
             return True
         except Exception as e:
@@ -32,13 +94,19 @@ class LobbyClient:
     
     def send_request(self, action, data=None):
         """發送請求並接收回應"""
-        request = {
-            "action": action,
-            "data": data or {}
-        }
-        send_message(self.sock, json.dumps(request))
-        response_str = recv_message(self.sock)
-        return json.loads(response_str)
+        payload = None if data else _EMPTY_REQUESTS.get(action)
+        if payload is None:
+            payload = _dumps({
+                "action": action,
+                "data": data or {}
+            })
+        send_message(self.sock, payload)
+        # server 主動推送的通知（有 type、沒有 status，如有人加入房間時的 room_update）
+        # 不是這個請求的回應，略過直到讀到真正的回應
+        while True:
+            response = _loads(recv_message(self.sock, self._rxbuf))
+            if not (response.get("type") and not response.get("status")):
+                return response
     
     def register(self, name, email, password):
         """註冊"""
@@ -48,7 +116,7 @@ class LobbyClient:
             "email": email,
             "password": password
         })
-        print(f"回應: {json.dumps(response, indent=2, ensure_ascii=False)}\n")
+        _print_response(response)
         return response.get("status") == "success"
     
     def login(self, email, password):
@@ -58,7 +126,7 @@ class LobbyClient:
             "email": email,
             "password": password
         })
-        print(f"回應: {json.dumps(response, indent=2, ensure_ascii=False)}\n")
+        _print_response(response)
         
         if response.get("status") == "success":
             self.user_id = response["data"]["user_id"]
@@ -66,11 +134,30 @@ class LobbyClient:
             return True
         return False
     
+    def bootstrap(self, name, email, password):
+        """
+        連線 → 登入；帳號還不存在（登入失敗）才註冊後再登入一次
+
+        測試帳號通常在第一次執行後就已存在，先登入可省下每次多餘的註冊 RTT。
+
+        Returns:
+            bool: 是否已登入；失敗的步驟會印出原因
+        """
+        if not self.connect():
+            return False
+        if self.login(email, password):
+            return True
+        self.register(name, email, password)
+        if not self.login(email, password):
+            print(f"❌ {name} 登入失敗\n")
+            return False
+        return True
+    
     def list_online_users(self):
         """列出線上使用者"""
         print("👥 查詢線上使用者")
         response = self.send_request("list_online_users")
-        print(f"回應: {json.dumps(response, indent=2, ensure_ascii=False)}\n")
+        _print_response(response)
         return response
     
     def create_room(self, room_name, visibility="public"):
@@ -80,14 +167,14 @@ class LobbyClient:
             "name": room_name,
             "visibility": visibility
         })
-        print(f"回應: {json.dumps(response, indent=2, ensure_ascii=False)}\n")
+        _print_response(response)
         return response
     
     def list_rooms(self):
         """列出公開房間"""
         print("🏠 查詢公開房間列表")
         response = self.send_request("list_rooms")
-        print(f"回應: {json.dumps(response, indent=2, ensure_ascii=False)}\n")
+        _print_response(response)
         return response
     
     def join_room(self, room_id):
@@ -96,7 +183,7 @@ class LobbyClient:
         response = self.send_request("join_room", {
             "room_id": room_id
         })
-        print(f"回應: {json.dumps(response, indent=2, ensure_ascii=False)}\n")
+        _print_response(response)
         return response
     
     def leave_room(self, room_id):
@@ -105,72 +192,224 @@ class LobbyClient:
         response = self.send_request("leave_room", {
             "room_id": room_id
         })
-        print(f"回應: {json.dumps(response, indent=2, ensure_ascii=False)}\n")
+        _print_response(response)
         return response
     
     def logout(self):
         """登出"""
         print("👋 登出")
         response = self.send_request("logout")
-        print(f"回應: {json.dumps(response, indent=2, ensure_ascii=False)}\n")
+        _print_response(response)
         return response
     
     def close(self):
         """關閉連線"""
         if self.sock:
             self.sock.close()
+            self.sock = None
+
+class AsyncLobbyClient:
+    """
+    Lobby Server 非同步測試客戶端（asyncio；多個客戶端可在同一執行緒重疊 RTT）
+
+    單一 reader task 持續讀取：帶 id 的回應交給對應請求的 Future，
+    server 主動推送的通知（如 room_update）收進 notifications，不會被誤當成回應。
+    """
+    
+    def __init__(self, host='127.0.0.1', port=10002):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+        self.user_id = None
+        self.user_name = None
+        self.notifications = []
+        self._pending = {}  # {request id: Future}
+        self._next_id = itertools.count(1)
+        self._reader_task = None
+    
+    async def connect(self):
+        """連線到 Lobby Server"""
+        try:
+            try:
+                self.reader, self.writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port), CONNECT_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise ConnectionRefusedError(f"連線逾時（{CONNECT_TIMEOUT} 秒），請確認 Lobby Server 是否已啟動")
+            self._reader_task = asyncio.create_task(self._read_loop())
+            print(f"✅ 成功連線到 Lobby Server ({self.host}:{self.port})\n")
+            return True
+        except Exception as e:
+            print(f"❌ 無法連線: {e}")
+            return False
+    
+    async def _read_loop(self):
+        """持續接收：回應依 id 交給等待中的請求，通知另外保存"""
+        error = ProtocolError("連線已關閉")
+        try:
+            while True:
+                message = _loads(await recv_message_async(self.reader))
+                future = self._pending.pop(message.get("id"), None)
+                if future is not None:
+                    if not future.done():
+                        future.set_result(message)
+                elif message.get("type") and not message.get("status"):
+                    self.notifications.append(message)
+        except (ProtocolError, ValueError, AttributeError) as e:
+            # 連線中斷、JSON 解析失敗（orjson.JSONDecodeError 也是 ValueError）或訊息不是 object
+            error = e if isinstance(e, ProtocolError) else ProtocolError(f"無效的回應: {e}")
+        finally:
+            # 不論 reader 因何結束（含 close() 取消），所有還在等待的請求都立即失敗
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self._pending.clear()
+    
+    async def send_request(self, action, data=None, timeout=10.0):
+        """發送請求並等待對應 id 的回應"""
+        if self._reader_task is None or self._reader_task.done():
+            raise ProtocolError("連線已關閉")
+        req_id = next(self._next_id)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[req_id] = future
+        request = {
+            "action": action,
+            "data": data or {},
+            "id": req_id
+        }
+        try:
+            await send_message_async(self.writer, _dumps(request))
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(req_id, None)
+    
+    async def register(self, name, email, password):
+        """註冊"""
+        print(f"📝 註冊使用者: {name}")
+        response = await self.send_request("register", {
+            "name": name,
+            "email": email,
+            "password": password
+        })
+        _print_response(response)
+        return response.get("status") == "success"
+    
+    async def login(self, email, password):
+        """登入"""
+        print(f"🔐 登入: {email}")
+        response = await self.send_request("login", {
+            "email": email,
+            "password": password
+        })
+        _print_response(response)
+        
+        if response.get("status") == "success":
+            self.user_id = response["data"]["user_id"]
+            self.user_name = response["data"]["name"]
+            return True
+        return False
+    
+    async def bootstrap(self, name, email, password):
+        """
+        連線 → 登入；帳號還不存在（登入失敗）才註冊後再登入一次
+
+        測試帳號通常在第一次執行後就已存在，先登入可省下每次多餘的註冊 RTT。
+
+        Returns:
+            bool: 是否已登入；失敗的步驟會印出原因
+        """
+        if not await self.connect():
+            return False
+        if await self.login(email, password):
+            return True
+        await self.register(name, email, password)
+        if not await self.login(email, password):
+            print(f"❌ {name} 登入失敗\n")
+            return False
+        return True
+    
+    async def create_room(self, room_name, visibility="public"):
+        """建立房間"""
+        print(f"🏠 建立房間: {room_name}")
+        response = await self.send_request("create_room", {
+            "name": room_name,
+            "visibility": visibility
+        })
+        _print_response(response)
+        return response
+    
+    async def join_room(self, room_id):
+        """加入房間"""
+        print(f"🚪 加入房間 ID: {room_id}")
+        response = await self.send_request("join_room", {
+            "room_id": room_id
+        })
+        _print_response(response)
+        return response
+    
+    async def close(self):
+        """關閉連線"""
+        if self._reader_task:
+            self._reader_task.cancel()
+            self._reader_task = None
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+            self.writer = None
 
 def test_lobby_server():
     """測試 Lobby Server"""
     
-    print("=" * 60)
-    print("開始測試 Lobby Server")
-    print("=" * 60)
-    print()
+    print(f"{_RULE}\n開始測試 Lobby Server\n{_RULE}\n")
     
     # 建立兩個客戶端（模擬兩個玩家）
     alice = LobbyClient()
     bob = LobbyClient()
     
     try:
-        # ========== 測試 1: 連線 ==========
-        print("【測試 1】連線到 Lobby Server")
-        print("-" * 60)
-        if not alice.connect():
-            return
-        if not bob.connect():
-            return
-        
-        # ========== 測試 2: 註冊 ==========
-        print("【測試 2】註冊使用者")
-        print("-" * 60)
-        alice.register("Alice", "alice@test.com", "password123")
-        bob.register("Bob", "bob@test.com", "password456")
+        # Alice 與 Bob 各用自己的 socket，建立房間前互不相依 → 兩邊同時進行
+        with ThreadPoolExecutor(max_workers=2) as ex:
+            # ========== 測試 1: 連線 ==========
+            print(f"【測試 1】連線到 Lobby Server\n{_THIN_RULE}")
+            if not all(ex.map(lambda c: c.connect(), [alice, bob])):
+                return
+            
+            # ========== 測試 2: 註冊 ==========
+            print(f"【測試 2】註冊使用者\n{_THIN_RULE}")
+            list(ex.map(lambda t: t[0].register(*t[1]), [
+                (alice, ("Alice", "alice@test.com", "password123")),
+                (bob, ("Bob", "bob@test.com", "password456")),
+            ]))
+            
+            # ========== 測試 3: 登入 ==========
+            print(f"【測試 3】登入\n{_THIN_RULE}")
+            alice_ok, bob_ok = ex.map(lambda t: t[0].login(*t[1]), [
+                (alice, ("alice@test.com", "password123")),
+                (bob, ("bob@test.com", "password456")),
+            ])
         
-        # ========== 測試 3: 登入 ==========
-        print("【測試 3】登入")
-        print("-" * 60)
-        if not alice.login("alice@test.com", "password123"):
+        if not alice_ok:
             print("❌ Alice 登入失敗")
             return
         print(f"✅ Alice 登入成功 (ID: {alice.user_id})\n")
         
-        if not bob.login("bob@test.com", "password456"):
+        if not bob_ok:
             print("❌ Bob 登入失敗")
             return
         print(f"✅ Bob 登入成功 (ID: {bob.user_id})\n")
         
         # ========== 測試 4: 線上使用者列表 ==========
-        print("【測試 4】查詢線上使用者")
-        print("-" * 60)
+        print(f"【測試 4】查詢線上使用者\n{_THIN_RULE}")
         response = alice.list_online_users()
         if response.get("status") == "success":
             users = response["data"]
             print(f"✅ 查詢到 {len(users)} 位線上使用者\n")
         
         # ========== 測試 5: 建立房間 ==========
-        print("【測試 5】Alice 建立房間")
-        print("-" * 60)
+        print(f"【測試 5】Alice 建立房間\n{_THIN_RULE}")
         response = alice.create_room("Alice's Game Room", "public")
         if response.get("status") == "success":
             room_id = response["data"]["id"]
@@ -180,16 +419,14 @@ def test_lobby_server():
             return
         
         # ========== 測試 6: 查詢房間列表 ==========
-        print("【測試 6】查詢公開房間列表")
-        print("-" * 60)
+        print(f"【測試 6】查詢公開房間列表\n{_THIN_RULE}")
         response = bob.list_rooms()
         if response.get("status") == "success":
             rooms = response["data"]
             print(f"✅ 查詢到 {len(rooms)} 個公開房間\n")
         
         # ========== 測試 7: 加入房間 ==========
-        print("【測試 7】Bob 加入 Alice 的房間")
-        print("-" * 60)
+        print(f"【測試 7】Bob 加入 Alice 的房間\n{_THIN_RULE}")
         response = bob.join_room(room_id)
         if response.get("status") == "success":
             print(f"✅ Bob 成功加入房間\n")
@@ -197,30 +434,26 @@ def test_lobby_server():
             print(f"❌ Bob 加入房間失敗: {response.get('message')}\n")
         
         # ========== 測試 8: 離開房間 ==========
-        print("【測試 8】Bob 離開房間")
-        print("-" * 60)
+        print(f"【測試 8】Bob 離開房間\n{_THIN_RULE}")
         response = bob.leave_room(room_id)
         if response.get("status") == "success":
             print(f"✅ Bob 成功離開房間\n")
         
         # ========== 測試 9: 登出 ==========
-        print("【測試 9】登出")
-        print("-" * 60)
+        print(f"【測試 9】登出\n{_THIN_RULE}")
         alice.logout()
         print("✅ Alice 已登出\n")
         
         # Bob 繼續保持連線（測試不同情況）
         print("(Bob 保持連線)\n")
         
-        print("=" * 60)
-        print("✅ 所有測試完成！")
-        print("=" * 60)
+        print(f"{_RULE}\n✅ 所有測試完成！\n{_RULE}")
         
     except ConnectionRefusedError:
-        print("❌ 無法連線到 Lobby Server")
-        print("請確認 Lobby Server 是否已啟動：")
-        print("  cd lobby_server")
-        print("  python3 lobby_server.py")
+        print("❌ 無法連線到 Lobby Server\n"
+              "請確認 Lobby Server 是否已啟動：\n"
+              "  cd lobby_server\n"
+              "  python3 lobby_server.py")
     except ProtocolError as e:
         print(f"❌ 協定錯誤: {e}")
     except Exception as e: